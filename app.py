@@ -1,9 +1,47 @@
 # app.py
-from fastapi import FastAPI
-from routes import auth_routes, session_routes, bill_routes, payment_routes, split_routes  # import other routes later
+import logging
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Response
+from routes import auth_routes, session_routes, bill_routes, payment_routes, split_routes, event_routes  # import other routes later
 from fastapi.middleware.cors import CORSMiddleware
+from utils.cache import cache_stats
+from utils.mail_service import mail_outbox
+from utils.password_hasher import password_hasher
+from utils.optimistic import contention_stats
+from utils.events import event_hub
+from utils.idempotency import IdempotencyMiddleware, idempotency_store
+from utils.rate_limit import rate_limit_stats
+from utils.metrics import MetricsMiddleware, render_metrics
+from utils.tracing import TracingMiddleware, InMemorySpanExporter, configure_logging, tracer
+from utils.storage import get_client
+from utils.health import storage_health
 
-app = FastAPI(title="ZeroTabs Backend", version="1.0.0")
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Each worker connects here, after any fork, never at import time
+    storage = get_client()
+    try:
+        await storage.connect()
+    except Exception:
+        logger.exception("Storage unavailable at startup, will retry on first use")
+    mail_outbox.start()
+    password_hasher.start()
+    storage_health.shutting_down = False
+    yield
+    # fail readiness first so the load balancer stops routing here
+    storage_health.shutting_down = True
+    await mail_outbox.stop()
+    password_hasher.shutdown()
+    await storage.close()
+
+
+app = FastAPI(title="ZeroTabs Backend", version="1.0.0", lifespan=lifespan)
 
 # Allow frontend origin(s)
 origins = [
@@ -12,22 +50,106 @@ origins = [
     "https://your-frontend-domain.com"  # Production
 ]
 
+# Retried creates with the same Idempotency-Key replay the first response
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths=[r"/bills/create", r"/bills/batch", r"/payments/create", r"/sessions/create", r"/splits/manual/[^/]+"],
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],          # or ["*"] for all origins
     allow_credentials=True,
     allow_methods=["*"],            # ["GET", "POST"] if you want to restrict
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Idempotent-Replayed", "X-Request-ID"],
 )
 
+# Request IDs and the per-request root span
+app.add_middleware(TracingMiddleware)
+
+# Outermost, so latency includes every other middleware
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth_routes.router)
 app.include_router(session_routes.router)
 app.include_router(bill_routes.router)
 app.include_router(payment_routes.router)
 app.include_router(split_routes.router)
+app.include_router(event_routes.router)
 
 # Root endpoint
 @app.get("/")
-def root():
+async def root():
     return {"message": "Welcome to ZeroTabs API 🚀"}
+
+# Liveness: the process is serving requests; never touches the cluster
+@app.get("/healthz")
+async def healthz():
+    return {
+        "status": "ok",
+        "uptime_seconds": round(time.time() - storage_health.started_at, 3),
+        "storage": storage_health.last(),
+    }
+
+# Readiness: storage answers a ping (cached for HEALTH_PING_TTL seconds)
+@app.get("/readyz")
+async def readyz(response: Response):
+    ready, details = await storage_health.ready()
+    if not ready:
+        response.status_code = 503
+    return details
+
+# Entity cache hit/miss counters
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return cache_stats()
+
+# Email outbox queue depth and delivery counters
+@app.get("/mail/stats")
+async def get_mail_stats():
+    return mail_outbox.stats()
+
+# bcrypt process pool saturation
+@app.get("/hasher/stats")
+async def get_hasher_stats():
+    return password_hasher.stats()
+
+# CAS conflicts and hottest contended keys
+@app.get("/contention/stats")
+async def get_contention_stats():
+    return contention_stats.snapshot()
+
+# Session event hub subscribers and delivery counters
+@app.get("/events/stats")
+async def get_event_stats():
+    return event_hub.stats()
+
+# Idempotency-Key executions, replays and conflicts
+@app.get("/idempotency/stats")
+async def get_idempotency_stats():
+    return idempotency_store.stats()
+
+# Rate limit rejections per route and bucket kind
+@app.get("/ratelimit/stats")
+async def get_rate_limit_stats():
+    return rate_limit_stats()
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+# Recent spans, when TRACING_EXPORTER=memory
+@app.get("/traces", include_in_schema=False)
+async def get_traces(request_id: str | None = None, limit: int = 200):
+    if not isinstance(tracer.exporter, InMemorySpanExporter):
+        raise HTTPException(status_code=404, detail="In-memory tracing is not enabled")
+
+    spans = tracer.exporter.get_finished_spans()
+    if request_id:
+        trace_ids = {s["trace_id"] for s in spans if s["attributes"].get("request_id") == request_id}
+        spans = [s for s in spans if s["trace_id"] in trace_ids]
+    return spans[-limit:]
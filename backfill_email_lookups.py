@@ -0,0 +1,16 @@
+# backfill_email_lookups.py
+import asyncio
+from dotenv import load_dotenv
+
+from models.user_model import UserModel
+
+load_dotenv()
+
+
+async def main():
+    print("🔧 Writing email lookups for users not keyed by their email...")
+    written = await UserModel().backfill_email_lookups()
+    print(f"🎉 {written} lookup(s) written")
+
+if __name__ == "__main__":
+    asyncio.run(main())
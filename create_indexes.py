@@ -0,0 +1,24 @@
+# create_indexes.py
+import asyncio
+import os
+from dotenv import load_dotenv
+
+from utils.queries import ensure_indexes
+from utils.storage import get_client
+
+load_dotenv()
+scope = os.getenv("COUCHBASE_SCOPE", "appdata")
+
+
+async def main():
+    if os.getenv("STORAGE_BACKEND", "couchbase").lower() == "memory":
+        print("ℹ️ Memory backend needs no indexes")
+        return
+
+    print("🔧 Creating query indexes...")
+    for name in await ensure_indexes(get_client(), scope):
+        print(f"✅ {name}")
+    print("🎉 Indexes ready!")
+
+if __name__ == "__main__":
+    asyncio.run(main())
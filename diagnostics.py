@@ -0,0 +1,132 @@
+# diagnostics.py
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from dotenv import load_dotenv
+
+from utils.latency import summarize
+from utils.queries import QUERIES, run_query
+from utils.storage import get_client
+
+load_dotenv()
+scope = os.getenv("COUCHBASE_SCOPE", "appdata")
+
+# Every collection the app reads or writes
+COLLECTIONS = ("bill_sessions", "sessions", "bills", "splits", "payments", "users", "vendors", "idempotency_keys")
+
+# Probe documents delete themselves even if a run is interrupted
+PROBE_EXPIRY = 300
+
+
+async def timed(op, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await op()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+async def measure(client, collection_name, iterations):
+    """
+    KV upsert/get of a throwaway document plus every registered query on the collection.
+    Returns {operation: latency summary or {"error": ...}}.
+    """
+    db = client.get_collection(scope, collection_name)
+    key = f"diagnostics::{uuid.uuid4().hex}"
+    doc = {"type": "diagnostics", "created_at": time.time()}
+
+    ops = {
+        "kv.upsert": lambda: db.upsert(key, doc, expiry=PROBE_EXPIRY),
+        "kv.get": lambda: db.get(key),
+    }
+    for name, query in QUERIES.items():
+        # parameterless queries (maintenance scans) would read the whole collection
+        if query.collection == collection_name and "$1" in query.statement:
+            # an unmatched parameter still exercises the index lookup
+            ops[f"query.{name}"] = lambda name=name: run_query(db, name, key)
+
+    results = {}
+    try:
+        for op_name, op in ops.items():
+            try:
+                results[op_name] = await timed(op, iterations)
+            except Exception as e:
+                results[op_name] = {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        try:
+            await db.remove(key)
+        except Exception:
+            pass  # never written, or left for the expiry to clean up
+    return results
+
+
+async def list_scopes(client):
+    if os.getenv("STORAGE_BACKEND", "couchbase").lower() == "memory":
+        return None
+    bucket = await client.connect()
+    return {s.name: sorted(c.name for c in s.collections) for s in await bucket.collections().get_all_scopes()}
+
+
+def print_report(ping, scopes, results):
+    print(f"{'✅' if ping.get('ok') else '❌'} Storage ping ({ping.get('backend', '?')})")
+    for service, report in ping.get("services", {}).items():
+        print(f"    • {service}: {'ok' if report['ok'] else 'FAILED'}, "
+              f"{report['endpoints']} endpoint(s), max {report['max_latency_ms']} ms")
+    if ping.get("error"):
+        print(f"    {ping['error']}")
+
+    if scopes is not None:
+        print("\n📂 Scopes & Collections:")
+        for scope_name, collections in scopes.items():
+            print(f"  - Scope: {scope_name}")
+            for name in collections:
+                print(f"    • Collection: {name}")
+
+    print(f"\n⏱️ Latency in ms (scope {scope}):")
+    print(f"  {'collection':<18} {'operation':<28} {'n':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for collection_name, ops in results.items():
+        for op_name, summary in ops.items():
+            if "error" in summary:
+                print(f"  {collection_name:<18} {op_name:<28} ❌ {summary['error']}")
+                continue
+            print(
+                f"  {collection_name:<18} {op_name:<28} {summary['count']:>5} "
+                f"{summary['p50']:>9.3f} {summary['p95']:>9.3f} {summary['p99']:>9.3f} {summary['max']:>9.3f}"
+            )
+
+
+async def main(args):
+    client = get_client()
+    try:
+        ping = await client.ping()
+    except Exception as e:
+        print(f"❌ Connection test failed: {e}")
+        return 1
+
+    scopes = await list_scopes(client) if args.list else None
+    results = {}
+    for collection_name in args.collections:
+        results[collection_name] = await measure(client, collection_name, args.iterations)
+    await client.close()
+
+    if args.json:
+        print(json.dumps({"ping": ping, "scopes": scopes, "latency_ms": results}, indent=2))
+    else:
+        print_report(ping, scopes, results)
+
+    failed = not ping["ok"] or any("error" in s for ops in results.values() for s in ops.values())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ping storage and measure KV and query latency per collection.")
+    parser.add_argument("-n", "--iterations", type=int, default=200, help="samples per operation (default 200)")
+    parser.add_argument("-c", "--collections", nargs="+", default=list(COLLECTIONS), metavar="NAME",
+                        help="collections to probe (default: all the app uses)")
+    parser.add_argument("--list", action="store_true", help="also list the bucket's scopes and collections")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
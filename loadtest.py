@@ -0,0 +1,221 @@
+# loadtest.py
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from collections import Counter, defaultdict
+
+# Reproducible by default: in-process storage, and no per-IP limits since
+# every simulated user shares one client address.
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+
+from app import app
+from utils.latency import summarize
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+MENU = [("Margherita", 12.5), ("Pepperoni", 14.0), ("Caesar salad", 9.75), ("Garlic bread", 5.25),
+        ("Lemonade", 3.5), ("Tiramisu", 7.0), ("Espresso", 2.75), ("Lasagna", 15.5)]
+SPLIT_MODES = ("equal", "weighted", "by_item")
+
+
+class Recorder:
+    """
+    Latency and status codes per endpoint (method + route template) for one scenario.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.started_at = time.perf_counter()
+        self.elapsed = None
+
+    def record(self, endpoint, seconds, status):
+        self.samples[endpoint].append(seconds)
+        self.statuses[endpoint][status] += 1
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started_at
+
+    def report(self):
+        endpoints = {}
+        for endpoint, samples in self.samples.items():
+            statuses = self.statuses[endpoint]
+            endpoints[endpoint] = {
+                **summarize(samples),
+                "errors": sum(n for status, n in statuses.items() if status >= 400),
+                "statuses": {str(status): n for status, n in sorted(statuses.items())},
+                "rps": round(len(samples) / self.elapsed, 1) if self.elapsed else None,
+            }
+        return {"elapsed_s": round(self.elapsed, 3), "endpoints": endpoints}
+
+
+class Harness:
+    """
+    Drives the app through an in-process ASGI client with at most
+    `concurrency` requests in flight.
+    """
+
+    def __init__(self, client, concurrency, seed):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.random = random.Random(seed)
+        self.run_id = uuid.UUID(int=self.random.getrandbits(128)).hex[:8]
+        self.recorder = None
+        self.reports = {}
+
+    async def scenario(self, name, jobs):
+        self.recorder = Recorder(name)
+        results = await asyncio.gather(*jobs)
+        self.recorder.finish()
+        self.reports[name] = self.recorder.report()
+        return results
+
+    async def call(self, method, template, json=None, **path_params):
+        """
+        One request; returns the JSON body, or None for an error status.
+        """
+        async with self.semaphore:
+            start = time.perf_counter()
+            response = await self.client.request(method, template.format(**path_params), json=json)
+            self.recorder.record(f"{method} {template}", time.perf_counter() - start, response.status_code)
+        return response.json() if response.is_success else None
+
+
+async def signup_and_login(h: Harness, i: int):
+    email = f"load-{h.run_id}-{i}@example.com"
+    password = f"pw-{i}-{h.run_id}"
+    signup = await h.call("POST", "/auth/signup", json={
+        "full_name": f"Load User {i}", "email": email, "phone": f"555{i:07d}", "password": password,
+    })
+    if signup is None:
+        return None
+    if await h.call("POST", "/auth/verify", json={"email": email, "code": signup["otp"]}) is None:
+        return None
+    login = await h.call("POST", "/auth/login", json={"email": email, "password": password})
+    return login and login["user"]["user_id"]
+
+
+async def create_and_fill_session(h: Harness, owner: str, members: list[str]):
+    created = await h.call("POST", "/sessions/create", json={
+        "vendor_id": "vendor_001", "session_name": f"Table {owner}", "created_by": owner,
+    })
+    if created is None:
+        return None
+    session_id = created["session"]["session_id"]
+    # everyone joins at once, contending for the same session document
+    await asyncio.gather(*(
+        h.call("POST", "/sessions/join", json={"session_id": session_id, "user_id": user_id})
+        for user_id in members
+    ))
+    return session_id
+
+
+async def create_bill(h: Harness, session_id: str, participants: list[str]):
+    items = []
+    for name, price in h.random.sample(MENU, h.random.randint(2, 5)):
+        sharers = h.random.sample(participants, h.random.randint(1, len(participants)))
+        items.append({"name": name, "price": price, "quantity": h.random.randint(1, 3), "assigned_to": sharers})
+    subtotal = round(sum(item["price"] * item["quantity"] for item in items), 2)
+    tax_percent, tip_percent = 8.875, h.random.choice((0, 15, 18, 20))
+
+    created = await h.call("POST", "/bills/create", json={
+        "session_id": session_id,
+        "vendor_id": "vendor_001",
+        "total_amount": round(subtotal * (1 + (tax_percent + tip_percent) / 100), 2),
+        "currency": "USD",
+        "items": items,
+        "split_mode": h.random.choice(SPLIT_MODES),
+        "weights": {user_id: h.random.randint(1, 3) for user_id in participants},
+        "tax_percent": tax_percent,
+        "tip_percent": tip_percent,
+    })
+    return created and created["splits"]
+
+
+async def pay_session(h: Harness, session_id: str, splits: list[dict]):
+    owed = defaultdict(float)
+    for split in splits:
+        owed[split["user_id"]] += split["amount"]
+    created = await h.call("POST", "/payments/create", json={
+        "session_id": session_id,
+        "vendor_id": "vendor_001",
+        "total_amount": round(sum(owed.values()), 2),
+        "currency": "USD",
+        "participants": [{"user_id": u, "amount": round(a, 2)} for u, a in owed.items()],
+    })
+    if created is None:
+        return
+    await h.call("POST", "/payments/{payment_id}/process", payment_id=created["payment"]["payment_id"])
+
+
+async def run(args):
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        h = Harness(client, args.concurrency, args.seed)
+
+        users = await h.scenario("signup_login_burst", [signup_and_login(h, i) for i in range(args.users)])
+        users = [u for u in users if u]
+        if not users:
+            raise SystemExit("❌ No user could sign up and log in")
+
+        tables = [users[i::args.sessions] for i in range(min(args.sessions, len(users)))]
+        session_ids = await h.scenario("session_create_join_storm", [
+            create_and_fill_session(h, table[0], table) for table in tables
+        ])
+        sessions = [(sid, table) for sid, table in zip(session_ids, tables) if sid]
+
+        bill_tables = [(sid, table) for sid, table in sessions for _ in range(args.bills_per_session)]
+        bills = await h.scenario("bill_creation_auto_splits", [
+            create_bill(h, session_id, table) for session_id, table in bill_tables
+        ])
+        splits_by_session = defaultdict(list)
+        for (session_id, _), splits in zip(bill_tables, bills):
+            splits_by_session[session_id].extend(splits or [])
+
+        await h.scenario("split_approval_wave", [
+            h.call("POST", "/splits/{split_id}/approve", json={"user_id": split["user_id"]}, split_id=split["split_id"])
+            for splits in splits_by_session.values() for split in splits
+        ])
+
+        await h.scenario("payment_processing", [
+            pay_session(h, session_id, splits) for session_id, splits in splits_by_session.items()
+        ])
+    return h.reports
+
+
+def print_report(reports):
+    for scenario, report in reports.items():
+        print(f"\n🚦 {scenario} ({report['elapsed_s']}s)")
+        print(f"  {'endpoint':<36} {'n':>6} {'err':>5} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+        for endpoint, s in report["endpoints"].items():
+            print(
+                f"  {endpoint:<36} {s['count']:>6} {s['errors']:>5} {s['rps']:>8.1f} "
+                f"{s['p50']:>9.3f} {s['p95']:>9.3f} {s['p99']:>9.3f} {s['max']:>9.3f}"
+            )
+    print("\nLatencies in ms; rps is completed requests per second of the scenario's wall time.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive the app through scripted traffic and report per-endpoint latency.")
+    parser.add_argument("--users", type=int, default=200, help="users signing up and logging in (default 200)")
+    parser.add_argument("--sessions", type=int, default=40, help="sessions the users are spread across (default 40)")
+    parser.add_argument("--bills-per-session", type=int, default=3, help="bills created per session (default 3)")
+    parser.add_argument("--concurrency", type=int, default=50, help="requests in flight at once (default 50)")
+    parser.add_argument("--seed", type=int, default=1, help="seed for generated names, items and amounts")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    reports = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        print_report(reports)
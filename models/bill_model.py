@@ -1,16 +1,26 @@
-from utils.couchbase_client import CouchbaseClient
+from couchbase.exceptions import DocumentNotFoundException
+from utils.storage import get_client
+from utils.cache import cached
+from utils.optimistic import optimistic_update
+from utils.tracing import traced
 import os
 from datetime import datetime
 import uuid
 
-scope = os.getenv("COUCHBASE_SCOPE")
+scope = os.getenv("COUCHBASE_SCOPE", "appdata")
 collection_name = "bills"
 
 class BillModel:
     def __init__(self):
-        self.db = CouchbaseClient().get_collection(scope, collection_name)
+        self.db = cached(get_client().get_collection(scope, collection_name))
 
-    def create_bill(self, bill_data: dict):
+    @traced()
+    async def create_bill(self, bill_data: dict):
+        bill = self.build_bill(bill_data)
+        await self.save_bill(bill)
+        return bill
+
+    def build_bill(self, bill_data: dict):
         bill_id = str(uuid.uuid4())
         bill = {
             "bill_id": bill_id,
@@ -19,11 +29,42 @@ class BillModel:
             "total_amount": bill_data.get("total_amount"),
             "currency": bill_data.get("currency", "USD"),
             "items": bill_data.get("items", []),
+            "split_config": {
+                "mode": bill_data.get("split_mode", "equal"),
+                "weights": bill_data.get("weights") or {},
+                "tax_percent": bill_data.get("tax_percent", 0),
+                "tip_percent": bill_data.get("tip_percent", 0),
+            },
+            "split_ids": [],
             "ai_validation": False,
             "created_at": datetime.utcnow().isoformat()
         }
-        self.db.upsert(key=bill_id, value=bill)
         return bill
 
-    def get_bill(self, bill_id: str):
-        return self.db.get(bill_id).content_as[dict]
+    @traced()
+    async def save_bill(self, bill: dict):
+        await self.db.upsert(key=bill["bill_id"], value=bill)
+
+    @traced()
+    async def get_bill(self, bill_id: str):
+        return await self.db.get(bill_id)
+
+    @traced()
+    async def add_split_ids(self, bill_id: str, split_ids: list[str]):
+        """
+        Record split keys on the bill so its splits can be fetched by key.
+        Appended with a CAS-guarded sub-document update, so concurrent callers
+        never drop each other's ids. Bills without split_ids are left on the
+        splits_by_bill query fallback. Returns False if the bill does not exist.
+        """
+        def append(bill):
+            known = bill.get("split_ids")
+            if known is None:
+                return []
+            return [("array_addunique", "split_ids", split_id) for split_id in dict.fromkeys(split_ids) if split_id not in known]
+
+        try:
+            await optimistic_update(self.db, bill_id, append)
+        except DocumentNotFoundException:
+            return False
+        return True
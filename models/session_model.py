@@ -1,4 +1,6 @@
-from utils.couchbase_client import CouchbaseClient
+import asyncio
+from utils.storage import get_client
+from utils.cache import cached
 import os
 from datetime import datetime, timezone
 from dotenv import load_dotenv
@@ -9,25 +11,28 @@ collection_name = "sessions"
 
 class SessionModel:
     def __init__(self):
-        self.db = CouchbaseClient().get_collection(scope, collection_name)
+        self.db = cached(get_client().get_collection(scope, collection_name))
 
-    def create_session(self, session_data: dict):
-        self.db.upsert(key=session_data.get("session_id"), value=session_data)
+    async def create_session(self, session_data: dict):
+        await self.db.upsert(key=session_data.get("session_id"), value=session_data)
         return {"message": "Session created successfully"}
 
-    def get_session(self, session_id: str) -> dict:
-        return self.db.get(session_id).content_as[dict]
+    async def get_session(self, session_id: str) -> dict:
+        return await self.db.get(session_id)
 
 # Test
 if __name__ == "__main__":
-    m = SessionModel()
-    test_session = {
-        "session_id": "sess_001",
-        "vendor_id": "vendor_001",
-        "created_by": "user_001",
-        "status": "active",
-        "participants": ["user_001", "user_002", "user_003"],
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    print(m.create_session(test_session))
-    print(m.get_session("sess_001"))
+    async def main():
+        m = SessionModel()
+        test_session = {
+            "session_id": "sess_001",
+            "vendor_id": "vendor_001",
+            "created_by": "user_001",
+            "status": "active",
+            "participants": ["user_001", "user_002", "user_003"],
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        print(await m.create_session(test_session))
+        print(await m.get_session("sess_001"))
+
+    asyncio.run(main())
@@ -1,16 +1,22 @@
-from utils.couchbase_client import CouchbaseClient
+from utils.storage import get_client
+from utils.queries import run_query
+from models.bill_model import BillModel
+from utils.tracing import traced
 import os
 import uuid
+from couchbase.exceptions import DocumentNotFoundException
 from datetime import datetime
 
-scope = os.getenv("COUCHBASE_SCOPE")
+scope = os.getenv("COUCHBASE_SCOPE", "appdata")
 collection_name = "splits"
 
 class SplitModel:
     def __init__(self):
-        self.db = CouchbaseClient().get_collection(scope, collection_name)
+        self.db = get_client().get_collection(scope, collection_name)
+        self.bill_model = BillModel()
 
-    def create_split(self, bill_id: str, user_id: str, amount: float, auto_generated=True):
+    @traced()
+    async def create_split(self, bill_id: str, user_id: str, amount: float, auto_generated=True):
         split_id = str(uuid.uuid4())
         split = {
             "split_id": split_id,
@@ -23,9 +29,25 @@ class SplitModel:
             "approved_at": None,
             "created_at": datetime.utcnow().isoformat()
         }
-        self.db.upsert(key=split_id, value=split)
+        await self.db.upsert(key=split_id, value=split)
+        await self.bill_model.add_split_ids(bill_id, [split_id])
         return split
 
-    def get_splits_for_bill(self, bill_id: str):
-        # naive query (better: N1QL later)
-        return [row for row in self.db.get_all() if row["bill_id"] == bill_id]
+    @traced()
+    async def get_splits_for_bill(self, bill_id: str):
+        """
+        Fetch a bill's splits by key using the split_ids stored on the bill.
+        Falls back to a N1QL query for bills written before split_ids existed;
+        a missing bill has no splits.
+        """
+        try:
+            bill = await self.bill_model.get_bill(bill_id)
+        except DocumentNotFoundException:
+            return []
+
+        split_ids = bill.get("split_ids")
+        if split_ids is not None:
+            docs = await self.db.get_multi(split_ids)
+            return [docs[split_id] for split_id in split_ids if split_id in docs]
+
+        return await run_query(self.db, "splits_by_bill", bill_id)
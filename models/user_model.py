@@ -1,4 +1,9 @@
-from utils.couchbase_client import CouchbaseClient
+import asyncio
+from utils.storage import get_client
+from utils.cache import cached
+from utils.queries import QUERIES
+from utils.tracing import traced
+from couchbase.exceptions import DocumentNotFoundException
 import os
 from datetime import datetime, timezone
 from dotenv import load_dotenv
@@ -9,26 +14,105 @@ collection_name = "users"
 
 class UserModel:
     def __init__(self):
-        self.db = CouchbaseClient().get_collection(scope, collection_name)
+        # credentials, OTPs and verification state are always read from storage:
+        # another worker's cache could still hold a consumed OTP or an old hash
+        self.store = get_client().get_collection(scope, collection_name)
+        # profile reads only; writes go through here so this process's cache is invalidated
+        self.db = cached(self.store)
 
-    def create_user(self, user_data: dict):
-        self.db.upsert(key=user_data.get("user_id"), value=user_data)
+    async def create_user(self, user_data: dict):
+        await self.db.upsert(key=user_data.get("user_id"), value=user_data)
         return {"message": "User created successfully"}
 
-    def get_user(self, user_id: str) -> dict:
-        return self.db.get(user_id).content_as[dict]
+    async def get_user(self, user_id: str, fresh: bool = False) -> dict:
+        """
+        fresh=True bypasses the cache; use it for anything that checks credentials.
+        """
+        return await (self.store if fresh else self.db).get(user_id)
+
+    # ---------------------
+    # Repository helpers used by the auth routes
+    # ---------------------
+
+    @staticmethod
+    def user_key(email: str) -> str:
+        return f"user::{email}"
+
+    @staticmethod
+    def email_key(email: str) -> str:
+        return f"email::{email}"
+
+    @traced()
+    async def save(self, user_id: str, user_doc: dict):
+        """
+        Store a user. Users not keyed by their email also get an email -> key lookup doc.
+        """
+        await self.db.upsert(user_id, user_doc)
+        email = user_doc.get("email")
+        if email and user_id != self.user_key(email):
+            await self.db.upsert(self.email_key(email), {"type": "email_lookup", "user_id": user_id})
+
+    @traced()
+    async def update_fields(self, user_id: str, fields: dict, remove: tuple = ()):
+        """
+        Set (and optionally remove) top-level fields in place with one sub-document mutation.
+        """
+        ops = [("upsert", path, value) for path, value in fields.items()]
+        ops += [("remove", path) for path in remove]
+        await self.db.mutate_in(user_id, ops)
+
+    @traced()
+    async def find_by_email(self, email: str):
+        """
+        Resolve a user by email with KV reads only: the canonical key and the
+        email lookup doc are fetched together, then the user the lookup points at.
+        Users stored under other keys need a lookup doc; see backfill_email_lookups.
+        Never cached, since the auth routes check credentials and OTPs on the result.
+        Returns (user_id, user_doc); raises DocumentNotFoundException.
+        """
+        user_id, lookup_key = self.user_key(email), self.email_key(email)
+        docs = await self.store.get_multi([user_id, lookup_key])
+        if user_id in docs:
+            return user_id, docs[user_id]
+        if lookup_key in docs:
+            user_id = docs[lookup_key]["user_id"]
+            return user_id, await self.store.get(user_id)
+        raise DocumentNotFoundException(message=f"no user with email {email}")
+
+    @traced()
+    async def backfill_email_lookups(self):
+        """
+        Write the email lookup doc of every user not stored under its canonical
+        key. Run once for data written before lookups existed; safe to re-run.
+        Returns the number of lookup docs written.
+        """
+        lookups = {}
+        async for row in self.store.query_iter(
+            QUERIES["users_with_email"].render(self.store.keyspace), prepared=True
+        ):
+            user_id, email = row["id"], row["email"]
+            if user_id != self.user_key(email):
+                lookups[self.email_key(email)] = {"type": "email_lookup", "user_id": user_id}
+
+        failed = await self.db.upsert_multi(lookups)
+        if failed:
+            raise next(iter(failed.values()))
+        return len(lookups)
 
 # Test
 if __name__ == "__main__":
-    m = UserModel()
-    test_user = {
-        "user_id": "user_001",
-        "full_name": "Alice Moyo",
-        "email": "alice@example.com",
-        "phone": "0123456789",
-        "kyc_verified": False,
-        "payment_method": {"type": "visa", "last4": "8675"},
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
-    print(m.create_user(test_user))
-    print(m.get_user("user_001"))
+    async def main():
+        m = UserModel()
+        test_user = {
+            "user_id": "user_001",
+            "full_name": "Alice Moyo",
+            "email": "alice@example.com",
+            "phone": "0123456789",
+            "kyc_verified": False,
+            "payment_method": {"type": "visa", "last4": "8675"},
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        print(await m.create_user(test_user))
+        print(await m.get_user("user_001"))
+
+    asyncio.run(main())
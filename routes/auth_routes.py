@@ -1,28 +1,30 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, EmailStr
 from datetime import datetime, timedelta, UTC
-import jwt, os, random, string
-from passlib.context import CryptContext
-from couchbase.options import QueryOptions
+import random, string
 from couchbase.exceptions import DocumentNotFoundException
-from utils.jwt_helper import create_access_token, decode_token
-from fastapi.security import OAuth2PasswordBearer
+from utils.jwt_helper import create_access_token, create_refresh_token, verify_refresh_token
+from utils.auth import get_current_claims
 
-from utils.couchbase_client import CouchbaseClient
-from utils.mail_service import MailService
+from models.user_model import UserModel
+from utils.mail_service import mail_outbox
+from utils.password_hasher import password_hasher, PasswordHasherBusy
+from utils.rate_limit import RateLimit
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
-SECRET_KEY = os.getenv("JWT_SECRET", "supersecret")
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+users = UserModel()
 
-scope = os.getenv("COUCHBASE_SCOPE", "appdata")
-collection_name = "users"
-db = CouchbaseClient().get_collection(scope, collection_name)
+# Per-route budgets: bcrypt and SMTP make these the expensive endpoints,
+# and the OTP endpoints must not allow guessing codes.
+signup_limit = RateLimit("signup", per_ip="20/hour", per_email="5/hour")
+verify_limit = RateLimit("verify", per_ip="30/minute", per_email="10/15m")
+login_limit = RateLimit("login", per_ip="30/minute", per_email="5/minute")
+forgot_password_limit = RateLimit("forgot_password", per_ip="10/hour", per_email="3/15m")
+reset_password_limit = RateLimit("reset_password", per_ip="30/minute", per_email="10/15m")
 
 
 # =====================
@@ -59,31 +61,56 @@ class ResetPasswordRequest(BaseModel):
 # Helpers
 # =====================
 
-def create_token(data: dict, expires_delta: timedelta):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + expires_delta
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+def public_profile(user: dict) -> dict:
+    """
+    Non-sensitive user fields; returned on login and embedded in access tokens.
+    """
+    return {
+        "user_id": user["user_id"],
+        "full_name": user["full_name"],
+        "email": user["email"],
+        "phone": user.get("phone"),
+        "verified": user.get("verified", False),
+        "kyc_verified": user.get("kyc_verified", False),
+        "created_at": user.get("created_at"),
+    }
+
+def issue_access_token(user: dict) -> str:
+    return create_access_token(
+        {"sub": user["user_id"], "profile": public_profile(user)}, ACCESS_TOKEN_EXPIRE_MINUTES
+    )
 
 def generate_otp(length=6):
     return ''.join(random.choices(string.digits, k=length))
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+def hasher_busy():
+    return HTTPException(status_code=503, detail="Server busy, try again shortly", headers={"Retry-After": "1"})
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise hasher_busy()
+
+async def verify_password(plain_password: str, hashed_password: str):
+    """
+    Returns (valid, new_hash); new_hash is set when the stored hash needs upgrading.
+    """
+    try:
+        return await password_hasher.verify_and_update(plain_password, hashed_password)
+    except PasswordHasherBusy:
+        raise hasher_busy()
 
 
 # =====================
 # Routes
 # =====================
 
-@router.post("/signup")
-def signup(req: SignupRequest):
-    user_id = f"user::{req.email}"
+@router.post("/signup", dependencies=[Depends(signup_limit)])
+async def signup(req: SignupRequest):
+    user_id = users.user_key(req.email)
     try:
-        existing = db.get(user_id)
+        await users.find_by_email(req.email)
         raise HTTPException(status_code=400, detail="User already exists")
     except DocumentNotFoundException:
         # Good! user doesn't exist, continue creating
@@ -95,7 +122,7 @@ def signup(req: SignupRequest):
         "full_name": req.full_name,
         "email": req.email,
         "phone": req.phone,
-        "password": hash_password(req.password),  # ✅ now hashed
+        "password": await hash_password(req.password),  # ✅ now hashed
         "kyc_verified": False,
         "verified": False,
         "otp": otp,
@@ -103,7 +130,7 @@ def signup(req: SignupRequest):
         "created_at": datetime.utcnow().isoformat()
     }
 
-    db.upsert(user_id, user_doc)
+    await users.save(user_id, user_doc)
 
     # TODO: send OTP email instead of returning
     # ✅ Send OTP via email
@@ -115,112 +142,93 @@ def signup(req: SignupRequest):
     <p>This code will expire in 10 minutes. Please don’t share it.</p>
     """
 
-    MailService.send_email(req.email, subject, body)
+    mail_outbox.enqueue(req.email, subject, body)
     return {"message": "User registered, verify email with OTP", "otp": otp}
 
 
-@router.post("/verify")
-def verify(req: VerifyRequest):
-    user_id = f"user::{req.email}"
+@router.post("/verify", dependencies=[Depends(verify_limit)])
+async def verify(req: VerifyRequest):
     try:
-        result = db.get(user_id)
-        user = result.content_as[dict]
+        user_id, user = await users.find_by_email(req.email)
     except Exception:
         raise HTTPException(status_code=404, detail="User not found")
 
     if user.get("otp") != req.code:
         raise HTTPException(status_code=400, detail="Invalid OTP")
 
-    user["verified"] = True
-    user["otp"] = None
-    db.upsert(user_id, user)
+    await users.update_fields(user_id, {"verified": True, "otp": None})
     return {"message": "Email verified successfully"}
 
 
-@router.post("/login")
-def login(req: LoginRequest):
-    user_id = f"user::{req.email}"
+@router.post("/login", dependencies=[Depends(login_limit)])
+async def login(req: LoginRequest):
     try:
-        result = db.get(user_id)
-        user = result.content_as[dict]
+        user_id, user = await users.find_by_email(req.email)
     except Exception:
         raise HTTPException(status_code=404, detail="User not found")
 
     if not user.get("verified"):
         raise HTTPException(status_code=403, detail="User not verified")
 
-    if not verify_password(req.password, user["password"]):
+    valid, new_hash = await verify_password(req.password, user["password"])
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    access_token = create_token({"sub": user_id}, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    refresh_token = create_token({"sub": user_id}, timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+    access_token = issue_access_token(user)
+    refresh_token = create_refresh_token(user_id, REFRESH_TOKEN_EXPIRE_DAYS)
 
     # update stored refresh token
-    user["refresh_token"] = refresh_token
-    db.upsert(user_id, user)
-
-    # build safe user payload
-    safe_user = {
-        "user_id": user["user_id"],
-        "full_name": user["full_name"],
-        "email": user["email"],
-        "phone": user.get("phone"),
-        "verified": user.get("verified", False),
-        "kyc_verified": user.get("kyc_verified", False),
-        "created_at": user.get("created_at"),
-    }
+    changes = {"refresh_token": refresh_token}
+    if new_hash:
+        # cost factor changed since this hash was made
+        changes["password"] = new_hash
+    await users.update_fields(user_id, changes)
 
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
         "token_type": "bearer",
-        "user": safe_user
+        "user": public_profile(user)
     }
 
 
 @router.post("/refresh")
-def refresh(req: TokenRefreshRequest):
+async def refresh(req: TokenRefreshRequest):
     try:
-        payload = jwt.decode(req.refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = verify_refresh_token(req.refresh_token)
         user_id = payload.get("sub")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Refresh token expired")
-    except jwt.PyJWTError:
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=str(e) or "Invalid refresh token")
+
+    if not user_id:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
     try:
-        result = db.get(user_id)
-        user = result.content_as[dict]
+        user = await users.get_user(user_id, fresh=True)
     except Exception:
         raise HTTPException(status_code=404, detail="User not found")
 
     if user.get("refresh_token") != req.refresh_token:
         raise HTTPException(status_code=401, detail="Refresh token mismatch")
 
-    new_access_token = create_token({"sub": user_id}, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    new_access_token = issue_access_token(user)
     return {"access_token": new_access_token, "token_type": "bearer"}
 
 
-@router.post("/forgot-password")
-def forgot_password(data: ForgotPasswordRequest):
-    query = f"SELECT META().id, u.* FROM `{db._bucket.name}`.`{scope}`.`{collection_name}` u WHERE u.email = $1"
-    rows = list(db._scope.bucket.cluster.query(query, QueryOptions(positional_parameters=[data.email])))
-
-    if not rows:
+@router.post("/forgot-password", dependencies=[Depends(forgot_password_limit)])
+async def forgot_password(data: ForgotPasswordRequest):
+    try:
+        user_id, user_doc = await users.find_by_email(data.email)
+    except DocumentNotFoundException:
         raise HTTPException(status_code=404, detail="User not found")
 
-    user_doc = rows[0]
-    user_id = user_doc["id"]
-
     otp = str(random.randint(100000, 999999))
     expiry = (datetime.now(UTC) + timedelta(minutes=10)).isoformat()
 
-    user_doc["reset_otp"] = otp
-    user_doc["reset_otp_expiry"] = expiry
-    db.upsert(user_id, user_doc)
+    await users.update_fields(user_id, {"reset_otp": otp, "reset_otp_expiry": expiry})
 
     # send OTP
-    MailService.send_email(
+    mail_outbox.enqueue(
         data.email,
         "Your Password Reset OTP",
         f"Use this OTP to reset your password: {otp}\nThis code expires in 10 minutes."
@@ -229,17 +237,13 @@ def forgot_password(data: ForgotPasswordRequest):
     return {"message": "OTP sent to your email"}
 
 
-@router.post("/reset-password")
-def reset_password(data: ResetPasswordRequest):
-    query = f"SELECT META().id, u.* FROM `{db._bucket.name}`.`{scope}`.`{collection_name}` u WHERE u.email = $1"
-    rows = list(db._scope.bucket.cluster.query(query, QueryOptions(positional_parameters=[data.email])))
-
-    if not rows:
+@router.post("/reset-password", dependencies=[Depends(reset_password_limit)])
+async def reset_password(data: ResetPasswordRequest):
+    try:
+        user_id, user_doc = await users.find_by_email(data.email)
+    except DocumentNotFoundException:
         raise HTTPException(status_code=404, detail="User not found")
 
-    user_doc = rows[0]
-    user_id = user_doc["id"]
-
     stored_otp = user_doc.get("reset_otp")
     expiry = user_doc.get("reset_otp_expiry")
 
@@ -253,56 +257,26 @@ def reset_password(data: ResetPasswordRequest):
         raise HTTPException(status_code=400, detail="Invalid OTP")
 
     # ✅ hash the new password before saving
-    user_doc["password"] = hash_password(data.new_password)
-    user_doc.pop("reset_otp", None)
-    user_doc.pop("reset_otp_expiry", None)
-    db.upsert(user_id, user_doc)
+    await users.update_fields(
+        user_id,
+        {"password": await hash_password(data.new_password)},
+        remove=("reset_otp", "reset_otp_expiry"),
+    )
 
     return {"message": "Password reset successful"}
 
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
-
-ACCESS_TOKEN_EXPIRE_MINUTES = 15
-REFRESH_TOKEN_EXPIRE_DAYS = 7
-
-class RefreshRequest(BaseModel):
-    refresh_token: str
 
 # Get current user info
 @router.get("/me")
-def get_me(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = decode_token(token)
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token")
-
-        result = db.get(user_id)
-        user = result.content_as[dict]
-        user.pop("password", None)
-        user.pop("otp", None)
-        return user
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+async def get_me(claims: dict = Depends(get_current_claims)):
+    profile = claims.get("profile")
+    if profile:
+        return profile
 
-# Refresh token endpoint
-@router.post("/refresh")
-def refresh(req: RefreshRequest):
+    # tokens issued before profiles were embedded
     try:
-        payload = decode_token(req.refresh_token)
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid refresh token")
-
-        result = db.get(user_id)
-        user = result.content_as[dict]
-        if user.get("refresh_token") != req.refresh_token:
-            raise HTTPException(status_code=401, detail="Refresh token mismatch")
-
-        new_access_token = create_access_token(
-            {"sub": user_id}, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        )
-        return {"access_token": new_access_token, "token_type": "bearer"}
+        user = await users.get_user(claims["sub"])
     except Exception:
-        raise HTTPException(status_code=401, detail="Invalid refresh token")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    return public_profile(user)
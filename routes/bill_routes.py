@@ -1,16 +1,31 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+import asyncio
+import functools
+import json
 import os
+from typing import Any
+from couchbase.exceptions import DocumentNotFoundException
 
-from utils.couchbase_client import CouchbaseClient
+from utils.storage import get_client
+from utils.cache import cached
+from utils.queries import run_query
 from services.bill_service import BillService
-from services.ai_service import AISplitService  # AI & manual split logic
+from services.ai_service import SplitWriteError
+from services.split_engine import SplitConfigError
+from utils.events import event_hub
 
 router = APIRouter(prefix="/bills", tags=["Bills"])
 
 scope = os.getenv("COUCHBASE_SCOPE", "appdata")
 collection_name = "bills"
-db = CouchbaseClient().get_collection(scope, collection_name)
+db = cached(get_client().get_collection(scope, collection_name))
+
+# bills accepted by one POST /bills/batch, and written per round by /bills/batch/stream
+BATCH_MAX = int(os.getenv("BILL_BATCH_MAX", "1000"))
+BATCH_CHUNK = int(os.getenv("BILL_BATCH_CHUNK", "200"))
+BATCH_PARALLEL = int(os.getenv("BILL_BATCH_PARALLEL", "4"))
 
 # =====================
 # Schemas
@@ -19,6 +34,7 @@ class BillItem(BaseModel):
     name: str
     price: float
     quantity: int = 1
+    assigned_to: list[str] = []  # user_ids sharing this item (split_mode="by_item")
 
 class BillCreate(BaseModel):
     session_id: str
@@ -27,54 +43,146 @@ class BillCreate(BaseModel):
     currency: str
     items: list[BillItem]
     manual_split: bool = False
+    split_mode: str = "equal"  # equal | weighted | by_item
+    weights: dict[str, float] = {}  # user_id -> weight (split_mode="weighted")
+    tax_percent: float = 0
+    tip_percent: float = 0
 
 # =====================
 # Routes
 # =====================
-bill_service = BillService()
-split_service = AISplitService()
+@functools.cache
+def get_bill_service() -> BillService:
+    # built on first request, not at import
+    return BillService()
+
 
 @router.post("/create")
-def create_bill(bill_data: BillCreate):
+async def create_bill(bill_data: BillCreate, bill_service: BillService = Depends(get_bill_service)):
     """
     Create a bill and auto-generate splits unless manual_split is True.
     """
-    bill = bill_service.create_bill(bill_data.dict())
+    try:
+        result = await bill_service.create_bill(bill_data.dict())
+    except DocumentNotFoundException:
+        raise HTTPException(status_code=404, detail="Session not found")
+    except SplitConfigError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SplitWriteError as e:
+        raise HTTPException(status_code=500, detail={"message": str(e), "failed_splits": e.errors})
 
-    if not bill_data.manual_split:
-        # Default → AI auto-generate splits
-        splits = split_service.auto_generate(
-            bill_id=bill["bill_id"], 
-            total_amount=bill["total_amount"],
-            session_id=bill["session_id"]   # ✅ added
-        )
+    await event_hub.publish(bill_data.session_id, "bill.created", result)
 
+    if not bill_data.manual_split:
         return {
-            "bill": bill,
-            "splits": splits,
+            "bill": result["bill"],
+            "splits": result["splits"],
             "message": "Bill created with AI-generated splits"
         }
 
     return {
-        "bill": bill,
+        "bill": result["bill"],
         "message": "Bill created, waiting for manual splits"
     }
 
+async def create_bill_batch(raw_bills: list, offset: int = 0):
+    """
+    Validate every bill, create the valid ones in one batch and return
+    per-bill results in input order; `index` counts from `offset`.
+    """
+    results = [None] * len(raw_bills)
+    valid, positions = [], []
+    for i, raw in enumerate(raw_bills):
+        try:
+            valid.append(BillCreate.model_validate(raw).dict())
+            positions.append(i)
+        except ValidationError as e:
+            results[i] = {"status": "error", "error": "Invalid bill", "details": e.errors(include_url=False, include_input=False)}
+
+    created = await get_bill_service().create_bills(valid) if valid else []
+    for i, result in zip(positions, created):
+        results[i] = result
+
+    for i, result in enumerate(results):
+        result["index"] = offset + i
+
+    await asyncio.gather(*(
+        event_hub.publish(r["bill"]["session_id"], "bill.created", {"bill": r["bill"], "splits": r["splits"]})
+        for r in results if r["status"] == "created"
+    ))
+    return results
+
+
+@router.post("/batch")
+async def create_bills_batch(bills: list[Any]):
+    """
+    Create up to BILL_BATCH_MAX bills in one call.
+    Each bill gets its own result; invalid or failed bills don't fail the batch.
+    """
+    if len(bills) > BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX} bills per batch")
+
+    results = await create_bill_batch(bills)
+    created = sum(1 for r in results if r["status"] == "created")
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
+@router.post("/batch/stream")
+async def create_bills_stream(request: Request):
+    """
+    NDJSON bulk ingestion: one bill per line in, one result per line out.
+    Bills are written in chunks of BILL_BATCH_CHUNK while the upload is still
+    arriving, so the batch size is not limited.
+    """
+    chunks = []
+    offset = 0
+
+    def submit(lines):
+        nonlocal offset
+        raw_bills = []
+        for line in lines:
+            try:
+                raw_bills.append(json.loads(line))
+            except ValueError:
+                raw_bills.append(line.decode(errors="replace"))  # reported per line by validation
+        chunks.append(asyncio.ensure_future(write_chunk(raw_bills, offset)))
+        offset += len(lines)
+
+    # at most BATCH_PARALLEL chunks hit the database at once
+    limit = asyncio.Semaphore(BATCH_PARALLEL)
+
+    async def write_chunk(raw_bills, offset):
+        async with limit:
+            return await create_bill_batch(raw_bills, offset)
+
+    pending, buffer = [], b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        pending.extend(line for line in lines if line.strip())
+        if len(pending) >= BATCH_CHUNK:
+            submit(pending)
+            pending = []
+    if buffer.strip():
+        pending.append(buffer)
+    if pending:
+        submit(pending)
+
+    async def results():
+        for chunk in chunks:
+            for result in await chunk:
+                yield json.dumps(result) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
 @router.get("/{bill_id}")
-def get_bill(bill_id: str):
+async def get_bill(bill_id: str):
     try:
-        result = db.get(bill_id)
-        return result.content_as[dict]
+        return await db.get(bill_id)
     except Exception:
         raise HTTPException(status_code=404, detail="Bill not found")
 
 @router.get("/session/{session_id}")
-def list_bills_for_session(session_id: str):
-    from couchbase.options import QueryOptions
-    query = f"""
-        SELECT b.* 
-        FROM `{db._bucket.name}`.`{scope}`.`{collection_name}` b 
-        WHERE b.session_id = $1
-    """
-    rows = db._scope.bucket.cluster.query(query, QueryOptions(positional_parameters=[session_id]))
-    return [row for row in rows]
+async def list_bills_for_session(session_id: str):
+    return await run_query(db, "bills_by_session", session_id)
@@ -0,0 +1,84 @@
+from fastapi import APIRouter, HTTPException, WebSocket
+from fastapi.responses import StreamingResponse
+import asyncio
+import json
+import os
+from couchbase.exceptions import DocumentNotFoundException
+
+from utils.storage import get_client
+from utils.cache import cached
+from utils.events import event_hub
+
+router = APIRouter(prefix="/sessions", tags=["Session Events"])
+
+scope = os.getenv("COUCHBASE_SCOPE", "appdata")
+db = cached(get_client().get_collection(scope, "bill_sessions"))
+
+# idle SSE streams send a comment this often so proxies keep them open
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+
+
+async def session_exists(session_id: str) -> bool:
+    try:
+        await db.get(session_id)
+        return True
+    except DocumentNotFoundException:
+        return False
+
+
+# =====================
+# Routes
+# =====================
+
+@router.websocket("/{session_id}/ws")
+async def session_events_ws(websocket: WebSocket, session_id: str):
+    """
+    Push every change event for the session as a JSON message.
+    """
+    if not await session_exists(session_id):
+        await websocket.close(code=4404)
+        return
+
+    await websocket.accept()
+    async with event_hub.subscribe(session_id) as events:
+        async def forward():
+            async for event in events:
+                await websocket.send_json(event)
+
+        async def until_disconnect():
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+
+        tasks = [asyncio.ensure_future(forward()), asyncio.ensure_future(until_disconnect())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+@router.get("/{session_id}/events")
+async def session_events_sse(session_id: str):
+    """
+    Server-Sent Events stream of the session's change events.
+    After reconnecting, fetch /sessions/{id}/snapshot to catch up.
+    """
+    if not await session_exists(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    async def stream():
+        async with event_hub.subscribe(session_id) as events:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(anext(events), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
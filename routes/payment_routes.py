@@ -3,14 +3,18 @@ from pydantic import BaseModel
 from datetime import datetime
 import os
 import uuid
+from couchbase.exceptions import DocumentNotFoundException
 
-from utils.couchbase_client import CouchbaseClient
+from utils.storage import get_client
+from utils.optimistic import optimistic_update, ContentionError
+from utils.queries import run_query
+from utils.events import event_hub
 
 router = APIRouter(prefix="/payments", tags=["Payments"])
 
 scope = os.getenv("COUCHBASE_SCOPE", "appdata")
 collection_name = "payments"
-db = CouchbaseClient().get_collection(scope, collection_name)
+db = get_client().get_collection(scope, collection_name)
 
 
 # =====================
@@ -34,7 +38,7 @@ class PaymentCreate(BaseModel):
 # =====================
 
 @router.post("/create")
-def create_payment(req: PaymentCreate):
+async def create_payment(req: PaymentCreate):
     payment_id = f"payment::{uuid.uuid4()}"
 
     new_payment = {
@@ -49,30 +53,33 @@ def create_payment(req: PaymentCreate):
         "created_at": datetime.utcnow().isoformat()
     }
 
-    db.upsert(payment_id, new_payment)
+    await db.upsert(payment_id, new_payment)
+    await event_hub.publish(req.session_id, "payment.created", new_payment)
     return {"message": "Payment created", "payment": new_payment}
 
 
 @router.post("/{payment_id}/process")
-def process_payment(payment_id: str):
-    try:
-        result = db.get(payment_id)
-        payment = result.content_as[dict]
-
+async def process_payment(payment_id: str):
+    def mark_processed(payment):
+        if payment["payment_status"] != "pending":
+            raise HTTPException(status_code=409, detail=f"Payment is already {payment['payment_status']}")
         # Simulate payment success
-        payment["payment_status"] = "processed"
-        payment["processed_at"] = datetime.utcnow().isoformat()
-
-        db.upsert(payment_id, payment)
-        return {"message": "Payment processed successfully", "payment": payment}
+        return [
+            ("replace", "payment_status", "processed"),
+            ("upsert", "processed_at", datetime.utcnow().isoformat()),
+        ]
 
-    except Exception:
+    try:
+        payment = await optimistic_update(db, payment_id, mark_processed)
+    except DocumentNotFoundException:
         raise HTTPException(status_code=404, detail="Payment not found")
+    except ContentionError:
+        raise HTTPException(status_code=409, detail="Payment is busy, try again")
+
+    await event_hub.publish(payment.get("session_id"), "payment.processed", payment)
+    return {"message": "Payment processed successfully", "payment": payment}
 
 
 @router.get("/session/{session_id}")
-def list_payments_for_session(session_id: str):
-    from couchbase.options import QueryOptions
-    query = f"SELECT p.* FROM `{db._bucket.name}`.`{scope}`.`{collection_name}` p WHERE p.session_id = $1"
-    rows = db._scope.bucket.cluster.query(query, QueryOptions(positional_parameters=[session_id]))
-    return [row for row in rows]
+async def list_payments_for_session(session_id: str):
+    return await run_query(db, "payments_by_session", session_id)
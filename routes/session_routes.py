@@ -1,16 +1,31 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime
+import base64
+import functools
+import json
 import os
 import uuid
+from couchbase.exceptions import DocumentNotFoundException
 
-from utils.couchbase_client import CouchbaseClient
+from utils.storage import get_client
+from utils.cache import cached
+from utils.optimistic import optimistic_update, ContentionError
+from services.session_service import SessionService, snapshot_etag
+from utils.events import event_hub
 
 router = APIRouter(prefix="/sessions", tags=["Bill Sessions"])
 
 scope = os.getenv("COUCHBASE_SCOPE", "appdata")
 collection_name = "bill_sessions"
-db = CouchbaseClient().get_collection(scope, collection_name)
+db = cached(get_client().get_collection(scope, collection_name))
+
+
+# built on first request, not at import
+@functools.cache
+def get_session_service() -> SessionService:
+    return SessionService()
 
 
 # =====================
@@ -32,7 +47,7 @@ class JoinSession(BaseModel):
 # =====================
 
 @router.post("/create")
-def create_session(req: SessionCreate):
+async def create_session(req: SessionCreate):
     session_id = f"session::{uuid.uuid4()}"
     new_session = {
         "session_id": session_id,
@@ -44,41 +59,135 @@ def create_session(req: SessionCreate):
         "created_at": datetime.utcnow().isoformat()
     }
 
-    db.upsert(session_id, new_session)
+    await db.upsert(session_id, new_session)
     return {"message": "Session created", "session": new_session}
 
 
 @router.post("/join")
-def join_session(req: JoinSession):
+async def join_session(req: JoinSession):
+    joined = False
+
+    def add_participant(session):
+        nonlocal joined
+        if session["status"] != "open":
+            raise HTTPException(status_code=400, detail="Session is closed")
+        joined = req.user_id not in session["participants"]
+        if not joined:
+            return []
+        return [("array_addunique", "participants", req.user_id)]
+
     try:
-        result = db.get(req.session_id)
-        session = result.content_as[dict]
-    except Exception:
+        session = await optimistic_update(db, req.session_id, add_participant)
+    except DocumentNotFoundException:
         raise HTTPException(status_code=404, detail="Session not found")
+    except ContentionError:
+        raise HTTPException(status_code=409, detail="Session is busy, try again")
 
-    if session["status"] != "open":
-        raise HTTPException(status_code=400, detail="Session is closed")
-
-    if req.user_id not in session["participants"]:
-        session["participants"].append(req.user_id)
-        db.upsert(req.session_id, session)
-
+    if joined:
+        await event_hub.publish(req.session_id, "session.joined", {"user_id": req.user_id, "session": session})
     return {"message": "Joined session", "session": session}
 
 
 @router.get("/{session_id}")
-def get_session(session_id: str):
+async def get_session(session_id: str):
     try:
-        result = db.get(session_id)
-        return result.content_as[dict]
+        return await db.get(session_id)
     except Exception:
         raise HTTPException(status_code=404, detail="Session not found")
 
 
+@router.get("/{session_id}/snapshot")
+async def get_session_snapshot(
+    session_id: str, request: Request, session_service: SessionService = Depends(get_session_service)
+):
+    """
+    The session with its bills, their splits and its payments in one response.
+    Send the last ETag in If-None-Match to get a 304 when nothing changed.
+    """
+    try:
+        snapshot = await session_service.snapshot(session_id)
+    except DocumentNotFoundException:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    etag = snapshot_etag(snapshot)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse(snapshot, headers=headers)
+
+
+def encode_cursor(row: dict) -> str:
+    raw = json.dumps([row["created_at"], row["session_id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return created_at, session_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/")
-def list_sessions():
-    # NOTE: N1QL query since sessions are multiple docs
-    from couchbase.options import QueryOptions
-    query = f"SELECT s.* FROM `{db._bucket.name}`.`{scope}`.`{collection_name}` s"
-    rows = db._scope.bucket.cluster.query(query, QueryOptions())
-    return [row for row in rows]
+async def list_sessions(
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=500),
+    cursor: str | None = None,
+    status: str | None = None,
+    vendor_id: str | None = None,
+    participant: str | None = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """
+    List sessions newest first, paginated by (created_at, session_id).
+
+    JSON mode returns one page (default 50) and sets X-Next-Cursor when more rows exist.
+    NDJSON mode streams rows as the query produces them; without a limit it streams everything.
+    """
+    params = []
+
+    def param(value):
+        params.append(value)
+        return f"${len(params)}"
+
+    # a predicate on the leading index key lets the planner use idx_sessions_created_at
+    conditions = ["s.created_at IS NOT MISSING"]
+    if status:
+        conditions.append(f"s.status = {param(status)}")
+    if vendor_id:
+        conditions.append(f"s.vendor_id = {param(vendor_id)}")
+    if participant:
+        conditions.append(f"ARRAY_CONTAINS(s.participants, {param(participant)})")
+    if cursor:
+        created_at, session_id = decode_cursor(cursor)
+        # range form of (created_at, session_id) < cursor, so the index scan starts at the cursor
+        created_at, session_id = param(created_at), param(session_id)
+        conditions.append(f"s.created_at <= {created_at}")
+        conditions.append(f"(s.created_at < {created_at} OR s.session_id < {session_id})")
+
+    # index order matches ORDER BY, so the scan needs no sort and stops at LIMIT
+    query = f"SELECT s.* FROM {db.keyspace} s WHERE " + " AND ".join(conditions)
+    query += " ORDER BY s.created_at DESC, s.session_id DESC"
+
+    if format == "ndjson":
+        if limit:
+            query += f" LIMIT {param(limit)}"
+        rows = db.query_iter(query, *params, prepared=True)
+        return StreamingResponse(
+            (json.dumps(row) + "\n" async for row in rows), media_type="application/x-ndjson"
+        )
+
+    page_size = limit or 50
+    # one extra row tells us whether there is a next page
+    query += f" LIMIT {param(page_size + 1)}"
+    rows = await db.query(query, *params, prepared=True)
+
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1])
+    return rows
@@ -1,17 +1,33 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
+import functools
 import os
-from utils.couchbase_client import CouchbaseClient
-from services.ai_service import AISplitService
+from utils.storage import get_client
+from utils.optimistic import optimistic_update, ContentionError
+from couchbase.exceptions import DocumentNotFoundException
+from services.ai_service import AISplitService, SplitWriteError
+from services.split_engine import compute_split, SplitConfigError
+from models.split_model import SplitModel
 from datetime import datetime, UTC
+from utils.events import event_hub
 
 router = APIRouter(prefix="/splits", tags=["Splits"])
 
 scope = os.getenv("COUCHBASE_SCOPE", "appdata")
 collection_name = "splits"
-db = CouchbaseClient().get_collection(scope, collection_name)
+db = get_client().get_collection(scope, collection_name)
+
+
+# built on first request, not at import
+@functools.cache
+def get_split_service() -> AISplitService:
+    return AISplitService()
+
+
+@functools.cache
+def get_split_model() -> SplitModel:
+    return SplitModel()
 
-split_service = AISplitService()
 
 # =====================
 # Schemas
@@ -26,27 +42,90 @@ class ApproveSplit(BaseModel):
     user_id: str  # who is approving
 
 
+class PreviewItem(BaseModel):
+    name: str
+    price: float
+    quantity: int = 1
+    assigned_to: list[str] = []
+
+
+class SplitPreview(BaseModel):
+    participants: list[str]
+    items: list[PreviewItem] = []
+    total_amount: float | None = None
+    split_mode: str = "equal"  # equal | weighted | by_item
+    weights: dict[str, float] = {}
+    tax_percent: float = 0
+    tip_percent: float = 0
+
+
+async def session_of_bill(bill_id: str):
+    try:
+        return (await get_split_model().bill_model.get_bill(bill_id)).get("session_id")
+    except DocumentNotFoundException:
+        return None
+
+
 # =====================
 # Routes
 # =====================
 
 @router.get("/bill/{bill_id}")
-def get_splits_for_bill(bill_id: str):
+async def get_splits_for_bill(bill_id: str, split_model: SplitModel = Depends(get_split_model)):
     """
     Get all splits for a given bill.
     """
-    from couchbase.options import QueryOptions
-    query = f"SELECT s.* FROM `{db._bucket.name}`.`{scope}`.`{collection_name}` s WHERE s.bill_id = $1"
-    rows = db._scope.bucket.cluster.query(query, QueryOptions(positional_parameters=[bill_id]))
-    return [row for row in rows]
+    return await split_model.get_splits_for_bill(bill_id)
+
+
+@router.post("/preview")
+async def preview_splits(req: SplitPreview):
+    """
+    Compute shares without storing anything, so clients can recompute on every edit.
+    """
+    items = [item.dict() for item in req.items]
+    try:
+        result = compute_split(
+            req.participants, items, req.total_amount,
+            mode=req.split_mode, weights=req.weights,
+            tax_percent=req.tax_percent, tip_percent=req.tip_percent,
+        )
+    except SplitConfigError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "total_amount": int(result.total_cents.sum()) / 100,
+        "shares": [
+            {
+                "user_id": user_id,
+                "amount": int(result.total_cents[i]) / 100,
+                "items_amount": int(result.item_cents[i].sum()) / 100,
+                "tax_amount": int(result.tax_cents[i]) / 100,
+                "tip_amount": int(result.tip_cents[i]) / 100,
+                "adjustment": int(result.adjustment_cents[i]) / 100,
+            }
+            for i, user_id in enumerate(result.participants)
+        ],
+    }
 
 
 @router.post("/manual/{bill_id}")
-def create_manual_splits(bill_id: str, splits: list[ManualSplit]):
+async def create_manual_splits(
+    bill_id: str, splits: list[ManualSplit], split_service: AISplitService = Depends(get_split_service)
+):
     """
     Create manual splits for a bill.
     """
-    saved_splits = split_service.manual_create(bill_id, [s.dict() for s in splits])
+    try:
+        saved_splits = await split_service.manual_create(bill_id, [s.dict() for s in splits])
+    except DocumentNotFoundException:
+        raise HTTPException(status_code=404, detail="Bill not found")
+    except ContentionError:
+        raise HTTPException(status_code=409, detail="Bill is busy, try again")
+    except SplitWriteError as e:
+        raise HTTPException(status_code=500, detail={"message": str(e), "failed_splits": e.errors})
+
+    await event_hub.publish(await session_of_bill(bill_id), "splits.created", {"bill_id": bill_id, "splits": saved_splits})
     return {
         "bill_id": bill_id,
         "splits": saved_splits,
@@ -55,24 +134,27 @@ def create_manual_splits(bill_id: str, splits: list[ManualSplit]):
 
 
 @router.post("/{split_id}/approve")
-def approve_split(split_id: str, data: ApproveSplit):
+async def approve_split(split_id: str, data: ApproveSplit):
     """
     Approve a split for a user.
     """
-    try:
-        split_doc = db.get(split_id).content_as[dict]
-
+    def approve(split_doc):
         if split_doc["user_id"] != data.user_id:
             raise HTTPException(status_code=403, detail="User does not own this split")
+        return [
+            ("replace", "approval_status", "approved"),
+            ("upsert", "approved_at", datetime.now(UTC).isoformat()),
+        ]
 
-        split_doc["approval_status"] = "approved"
-        split_doc["approved_at"] = datetime.now(UTC).isoformat()
-
-        db.upsert(split_id, split_doc)
-        return {
-            "split": split_doc,
-            "message": "Split approved successfully"
-        }
-
-    except Exception:
+    try:
+        split_doc = await optimistic_update(db, split_id, approve)
+    except DocumentNotFoundException:
         raise HTTPException(status_code=404, detail="Split not found")
+    except ContentionError:
+        raise HTTPException(status_code=409, detail="Split is busy, try again")
+
+    await event_hub.publish(await session_of_bill(split_doc["bill_id"]), "split.approved", split_doc)
+    return {
+        "split": split_doc,
+        "message": "Split approved successfully"
+    }
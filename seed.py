@@ -1,7 +1,8 @@
 # seed_data.py
+import asyncio
 from models import VendorModel, SessionModel, BillModel, SplitModel, PaymentModel
 
-def seed_vendors():
+async def seed_vendors():
     vendor_model = VendorModel()
     test_vendor = {
         "vendor_id": "vendor_001",
@@ -12,10 +13,10 @@ def seed_vendors():
         "payment_account": {"bank": "Chase", "account_number": "12345678"},
         "created_at": "2025-08-16T12:00:00Z"
     }
-    vendor_model.create_vendor(test_vendor)
+    await vendor_model.create_vendor(test_vendor)
     print("✅ Inserted vendor")
 
-def seed_sessions():
+async def seed_sessions():
     session_model = SessionModel()
     test_session = {
         "session_id": "session_001",
@@ -25,10 +26,10 @@ def seed_sessions():
         "created_at": "2025-08-16T12:05:00Z",
         "participants": ["alice", "bob", "charlie"]
     }
-    session_model.create_session(test_session)
+    await session_model.create_session(test_session)
     print("✅ Inserted session")
 
-def seed_bills():
+async def seed_bills():
     bill_model = BillModel()
     test_bill = {
         "bill_id": "bill_001",
@@ -44,10 +45,10 @@ def seed_bills():
         "ai_validation": True,
         "created_at": "2025-08-16T12:10:00Z"
     }
-    bill_model.create_bill(test_bill)
+    await bill_model.create_bill(test_bill)
     print("✅ Inserted bill")
 
-def seed_splits():
+async def seed_splits():
     split_model = SplitModel()
     test_split = {
         "split_id": "split_001",
@@ -58,10 +59,10 @@ def seed_splits():
         "approval_status": "pending",
         "approved_at": None
     }
-    split_model.create_split(test_split)
+    await split_model.create_split(test_split)
     print("✅ Inserted split")
 
-def seed_payments():
+async def seed_payments():
     payment_model = PaymentModel()
     test_payment = {
         "payment_id": "payment_001",
@@ -73,14 +74,17 @@ def seed_payments():
         "payment_status": "processing",
         "processed_at": None
     }
-    payment_model.create_payment(test_payment)
+    await payment_model.create_payment(test_payment)
     print("✅ Inserted payment")
 
-if __name__ == "__main__":
+async def main():
     print("🌱 Seeding mock data into Couchbase...")
-    seed_vendors()
-    seed_sessions()
-    seed_bills()
-    seed_splits()
-    seed_payments()
+    await seed_vendors()
+    await seed_sessions()
+    await seed_bills()
+    await seed_splits()
+    await seed_payments()
     print("🎉 Done seeding!")
+
+if __name__ == "__main__":
+    asyncio.run(main())
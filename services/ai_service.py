@@ -1,57 +1,84 @@
 import uuid
 from datetime import datetime, UTC
 import os
-from utils.couchbase_client import CouchbaseClient
+from utils.storage import get_client
+from utils.cache import cached
+from models.bill_model import BillModel
+from services.split_engine import compute_split
+from utils.tracing import traced
 
 scope = os.getenv("COUCHBASE_SCOPE", "appdata")
 
+
+class SplitWriteError(Exception):
+    """
+    Raised when some splits could not be stored.
+    `errors` maps split_id -> error message for every failed split.
+    """
+
+    def __init__(self, errors: dict):
+        self.errors = errors
+        super().__init__(f"Failed to store {len(errors)} split(s)")
+
+
 class AISplitService:
     def __init__(self):
-        self.split_db = CouchbaseClient().get_collection(scope, "splits")
-        self.session_db = CouchbaseClient().get_collection(scope, "bill_sessions")
+        self.split_db = get_client().get_collection(scope, "splits")
+        # participants decide who owes money, so never from this process's cache:
+        # a join on another worker would not have invalidated it
+        self.session_db = get_client().get_collection(scope, "bill_sessions")
+        self.bill_model = BillModel()
 
-    def auto_generate(self, bill_id: str, total_amount: float, session_id: str = None):
+    @traced()
+    async def resolve_participants(self, session_id: str):
         """
-        Auto-generate splits using participants from the bill_session.
-        If no session_id is passed, we try to resolve it from Couchbase later.
+        The participants of a bill_session.
+        Raises DocumentNotFoundException if the session does not exist.
         """
-        participants = []
-
-        # If session_id is provided, pull participants
-        if session_id:
-            try:
-                session = self.session_db.get(session_id).content_as[dict]
-                participants = session.get("participants", [])
-            except Exception:
-                pass  # fallback to empty
-
-        # Fallback: if no participants found, assign dummy
-        if not participants:
-            participants = ["alice", "bob", "charlie"]
+        session = await self.session_db.get(session_id)
+        return session.get("participants", [])
 
-        # Even split
-        share = round(total_amount / len(participants), 2)
+    @traced()
+    def build_splits(self, bill_id: str, total_amount: float, participants: list[str],
+                     items: list[dict] = None, split_config: dict = None):
+        """
+        Compute split documents for a bill without storing them.
+        `split_config` holds mode, weights, tax_percent and tip_percent
+        (see services.split_engine.compute_split); the default is an even split.
+        Amounts are exact to the cent and add up to total_amount.
+        """
+        items = items or []
+        result = compute_split(participants, items, total_amount, **(split_config or {}))
 
         splits = []
-        for user_id in participants:
+        for i, user_id in enumerate(participants):
             split = {
                 "split_id": str(uuid.uuid4()),
                 "bill_id": bill_id,
                 "user_id": user_id,
-                "amount": share,
-                "items": [],  # AI could later map items
+                "amount": int(result.total_cents[i]) / 100,
+                "items": [
+                    {"name": item.get("name"), "amount": int(cents) / 100}
+                    for item, cents in zip(items, result.item_cents[i])
+                    if cents
+                ],
+                "tax_amount": int(result.tax_cents[i]) / 100,
+                "tip_amount": int(result.tip_cents[i]) / 100,
                 "approval_status": "pending",
                 "created_at": datetime.now(UTC).isoformat()
             }
-            self.split_db.upsert(split["split_id"], split)
             splits.append(split)
 
         return splits
 
-    def manual_create(self, bill_id: str, splits_data: list[dict]):
+    @traced()
+    async def manual_create(self, bill_id: str, splits_data: list[dict]):
         """
         Store manually created splits.
+        Raises DocumentNotFoundException, before writing anything, if the bill does not exist.
         """
+        await self.bill_model.get_bill(bill_id)
+
         saved_splits = []
         for split in splits_data:
             split_doc = {
@@ -63,7 +90,17 @@ class AISplitService:
                 "approval_status": "pending",
                 "created_at": datetime.now(UTC).isoformat()
             }
-            self.split_db.upsert(split_doc["split_id"], split_doc)
             saved_splits.append(split_doc)
 
+        await self.store_splits(saved_splits)
+        await self.bill_model.add_split_ids(bill_id, [s["split_id"] for s in saved_splits])
         return saved_splits
+
+    @traced()
+    async def store_splits(self, splits: list[dict]):
+        """
+        Write all splits in one concurrent batch.
+        """
+        failed = await self.split_db.upsert_multi({s["split_id"]: s for s in splits})
+        if failed:
+            raise SplitWriteError({split_id: str(err) for split_id, err in failed.items()})
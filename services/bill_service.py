@@ -1,18 +1,111 @@
+import asyncio
+from couchbase.exceptions import DocumentNotFoundException
 from models.bill_model import BillModel
 from services.ai_service import AISplitService
+from services.split_engine import SplitConfigError
+from utils.tracing import traced
 
 class BillService:
     def __init__(self):
         self.bill_model = BillModel()
         self.split_service = AISplitService()
 
-    def create_bill(self, bill_data: dict):
-        bill = self.bill_model.create_bill(bill_data)
+    @traced()
+    async def create_bill(self, bill_data: dict):
+        """
+        The one bill creation pipeline: participants are resolved and splits
+        computed once, then the splits are written and the bill after them.
+        Raises DocumentNotFoundException if the session does not exist and
+        SplitConfigError if the split settings don't fit it, both before
+        anything is written.
+        """
+        bill = self.bill_model.build_bill(bill_data)
 
         manual_split = bill_data.get("manual_split", False)
         splits = []
 
         if not manual_split:
-            splits = self.split_service.auto_generate(bill["bill_id"], bill["total_amount"])
+            participants = await self.split_service.resolve_participants(bill["session_id"])
+            splits = self.split_service.build_splits(
+                bill["bill_id"], bill["total_amount"], participants, bill["items"], bill["split_config"]
+            )
+            bill["split_ids"] = [split["split_id"] for split in splits]
+
+        # splits first: a bill is only stored once every split it points at exists
+        await self.split_service.store_splits(splits)
+        await self.bill_model.save_bill(bill)
 
         return {"bill": bill, "splits": splits}
+
+    @traced()
+    async def create_bills(self, bills_data: list[dict]):
+        """
+        Batch version of create_bill for bulk ingestion.
+
+        Participants are resolved once per distinct session, then every bill
+        and every split is written with one multi-upsert each, splits first. Returns one
+        result per input, in order, with status "created" or "error"; a bad
+        bill never fails the others.
+        """
+        session_ids = {
+            data.get("session_id") for data in bills_data if not data.get("manual_split", False)
+        }
+        session_ids = list(session_ids)
+        resolved = await asyncio.gather(
+            *(self.split_service.resolve_participants(s) for s in session_ids), return_exceptions=True
+        )
+        participants_by_session = {}
+        for session_id, participants in zip(session_ids, resolved):
+            if isinstance(participants, DocumentNotFoundException):
+                continue  # reported per bill below
+            if isinstance(participants, BaseException):
+                raise participants
+            participants_by_session[session_id] = participants
+
+        results = []
+        bills, splits = {}, {}
+        for index, bill_data in enumerate(bills_data):
+            bill = self.bill_model.build_bill(bill_data)
+            bill_splits = []
+            if not bill_data.get("manual_split", False):
+                if bill["session_id"] not in participants_by_session:
+                    results.append({"index": index, "status": "error", "error": "Session not found"})
+                    continue
+                try:
+                    bill_splits = self.split_service.build_splits(
+                        bill["bill_id"], bill["total_amount"],
+                        participants_by_session[bill["session_id"]], bill["items"], bill["split_config"],
+                    )
+                except SplitConfigError as e:
+                    results.append({"index": index, "status": "error", "error": str(e)})
+                    continue
+                bill["split_ids"] = [split["split_id"] for split in bill_splits]
+
+            bills[bill["bill_id"]] = bill
+            splits.update((split["split_id"], split) for split in bill_splits)
+            results.append({"index": index, "status": "created", "bill": bill, "splits": bill_splits})
+
+        # splits first; a bill whose splits did not all land is not written
+        failed_splits = await self.split_service.split_db.upsert_multi(splits)
+        split_errors = {}
+        for bill_id, bill in list(bills.items()):
+            errors = {
+                split_id: str(failed_splits[split_id])
+                for split_id in bill["split_ids"] if split_id in failed_splits
+            }
+            if errors:
+                split_errors[bill_id] = errors
+                del bills[bill_id]
+        failed_bills = await self.bill_model.db.upsert_multi(bills)
+
+        for result in results:
+            if result["status"] != "created":
+                continue
+            bill_id = result["bill"]["bill_id"]
+            if bill_id in split_errors:
+                errors = split_errors[bill_id]
+                result.update(status="error", error=f"Failed to store {len(errors)} split(s)", failed_splits=errors)
+            elif bill_id in failed_bills:
+                result.update(status="error", error=str(failed_bills[bill_id]))
+
+        return results
@@ -1 +1,78 @@
 # session_service.py
+import asyncio
+import hashlib
+import json
+import os
+
+from utils.storage import get_client
+from utils.cache import cached
+from utils.queries import run_query
+from utils.tracing import traced
+
+scope = os.getenv("COUCHBASE_SCOPE", "appdata")
+
+
+class SessionService:
+    def __init__(self):
+        self.session_db = cached(get_client().get_collection(scope, "bill_sessions"))
+        self.bill_db = cached(get_client().get_collection(scope, "bills"))
+        self.split_db = get_client().get_collection(scope, "splits")
+        self.payment_db = get_client().get_collection(scope, "payments")
+
+    @traced()
+    async def snapshot(self, session_id: str):
+        """
+        Everything a table view needs in one document: the session, its bills
+        with their splits, and its payments.
+
+        The session and payments are read while the bills query runs; every
+        bill's splits are then fetched by key in one batch. Raises
+        DocumentNotFoundException if the session does not exist.
+        """
+        session_task = asyncio.ensure_future(self.session_db.get(session_id))
+        payments_task = asyncio.ensure_future(run_query(self.payment_db, "payments_by_session", session_id))
+        try:
+            bills = await run_query(self.bill_db, "bills_by_session", session_id)
+            splits_by_bill = await self._splits_for_bills(bills)
+            session, payments = await asyncio.gather(session_task, payments_task)
+        except BaseException:
+            session_task.cancel()
+            payments_task.cancel()
+            raise
+
+        bills.sort(key=lambda bill: (bill.get("created_at") or "", bill["bill_id"]))
+        return {
+            "session": session,
+            "bills": [
+                {**bill, "splits": splits_by_bill.get(bill["bill_id"], [])}
+                for bill in bills
+            ],
+            "payments": sorted(payments, key=lambda p: (p.get("created_at") or "", p["payment_id"])),
+        }
+
+    async def _splits_for_bills(self, bills: list[dict]):
+        # bills written before split_ids existed fall back to the splits_by_bill query
+        indexed = [bill for bill in bills if bill.get("split_ids") is not None]
+        legacy = [bill["bill_id"] for bill in bills if bill.get("split_ids") is None]
+
+        split_ids = [split_id for bill in indexed for split_id in bill["split_ids"]]
+        docs, *legacy_rows = await asyncio.gather(
+            self.split_db.get_multi(split_ids),
+            *(run_query(self.split_db, "splits_by_bill", bill_id) for bill_id in legacy),
+        )
+
+        splits_by_bill = {
+            bill["bill_id"]: [docs[split_id] for split_id in bill["split_ids"] if split_id in docs]
+            for bill in indexed
+        }
+        for bill_id, rows in zip(legacy, legacy_rows):
+            splits_by_bill[bill_id] = sorted(rows, key=lambda split: split["split_id"])
+        return splits_by_bill
+
+
+def snapshot_etag(snapshot: dict) -> str:
+    """
+    Strong ETag over the canonical JSON form of a snapshot.
+    """
+    body = json.dumps(snapshot, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
@@ -0,0 +1,153 @@
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+
+SPLIT_MODES = ("equal", "weighted", "by_item")
+
+
+class SplitConfigError(ValueError):
+    """
+    Raised when a split request cannot be computed (unknown mode, bad weights,
+    items assigned to people outside the session, ...).
+    """
+
+
+def to_cents(amount) -> int:
+    return int(Decimal(str(amount)).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def allocate(totals, weights):
+    """
+    Split integer `totals` across the rows of `weights` in proportion to them,
+    column by column, with largest-remainder rounding: every column sums exactly
+    to its total and no share is off by more than one cent from its ideal.
+
+    totals: int array (n_columns,); weights: float array (n_rows, n_columns).
+    Columns whose weights are all zero are spread evenly.
+    """
+    totals = np.asarray(totals, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float64)
+    column_weight = weights.sum(axis=0)
+    weights = np.where(column_weight > 0, weights, 1.0)
+    column_weight = weights.sum(axis=0)
+
+    ideal = weights * (totals / column_weight)
+    shares = np.floor(ideal).astype(np.int64)
+    leftover = totals - shares.sum(axis=0)
+
+    # rank each row's fractional part within its column; the top `leftover` get a cent
+    order = np.argsort(-(ideal - shares), axis=0, kind="stable")
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(weights.shape[0])[:, None], axis=0)
+    return shares + (rank < leftover)
+
+
+@dataclass
+class SplitResult:
+    participants: list[str]
+    item_cents: np.ndarray      # (participants, items)
+    tax_cents: np.ndarray       # (participants,)
+    tip_cents: np.ndarray       # (participants,)
+    adjustment_cents: np.ndarray  # (participants,) difference to the bill total
+    total_cents: np.ndarray     # (participants,)
+
+    def amounts(self):
+        return dict(zip(self.participants, (self.total_cents / 100).tolist()))
+
+
+def assignment_matrix(participants: list[str], items: list[dict], mode: str = "equal", weights: dict = None):
+    """
+    Build the participants x items weight matrix for a split mode.
+
+    equal:    everyone shares every item equally.
+    weighted: everyone shares every item by `weights[user_id]` (default 1).
+    by_item:  each item is shared equally by its `assigned_to` users;
+              unassigned items are shared by everyone.
+    """
+    if mode not in SPLIT_MODES:
+        raise SplitConfigError(f"Unknown split mode {mode!r}, expected one of {', '.join(SPLIT_MODES)}")
+
+    n_items = max(len(items), 1)
+    if mode == "equal":
+        return np.ones((len(participants), n_items))
+
+    if mode == "weighted":
+        weights = weights or {}
+        unknown = set(weights) - set(participants)
+        if unknown:
+            raise SplitConfigError(f"Weights given for non-participants: {sorted(unknown)}")
+        column = np.array([float(weights.get(user_id, 1.0)) for user_id in participants])
+        if (column < 0).any() or column.sum() <= 0:
+            raise SplitConfigError("Weights must be non-negative and not all zero")
+        return np.repeat(column[:, None], n_items, axis=1)
+
+    index = {user_id: i for i, user_id in enumerate(participants)}
+    matrix = np.zeros((len(participants), n_items))
+    for j, item in enumerate(items):
+        assigned = item.get("assigned_to") or participants
+        unknown = [user_id for user_id in assigned if user_id not in index]
+        if unknown:
+            raise SplitConfigError(f"Item {item.get('name')!r} is assigned to non-participants: {unknown}")
+        matrix[[index[user_id] for user_id in assigned], j] = 1.0
+    return matrix
+
+
+def compute_split(
+    participants: list[str],
+    items: list[dict],
+    total_amount: float = None,
+    mode: str = "equal",
+    weights: dict = None,
+    tax_percent: float = 0,
+    tip_percent: float = 0,
+) -> SplitResult:
+    """
+    Compute every participant's share of a bill in cents.
+
+    Item lines (price * quantity) are divided with the assignment matrix, then
+    tax and tip are charged on each participant's item subtotal. If
+    `total_amount` is given the shares are reconciled to it exactly, so they
+    always add up to the bill total; any difference (service charge, rounding
+    on the receipt) is spread in proportion to the shares. Bills without items
+    split `total_amount` by the mode's weights, taken as already including tax
+    and tip.
+    """
+    if not participants:
+        raise SplitConfigError("A split needs at least one participant")
+    if tax_percent < 0 or tip_percent < 0:
+        raise SplitConfigError("Tax and tip percentages must not be negative")
+
+    matrix = assignment_matrix(participants, items, mode, weights)
+    n = len(participants)
+
+    if items:
+        line_cents = np.array([to_cents(item["price"]) * int(item.get("quantity", 1)) for item in items], dtype=np.int64)
+    else:
+        line_cents = np.array([to_cents(total_amount or 0)], dtype=np.int64)
+    item_cents = allocate(line_cents, matrix)
+
+    subtotals = item_cents.sum(axis=1)
+    subtotal = int(subtotals.sum()) if items else 0
+    charges = np.array([
+        to_cents(Decimal(subtotal) * Decimal(str(tax_percent)) / 10000),
+        to_cents(Decimal(subtotal) * Decimal(str(tip_percent)) / 10000),
+    ], dtype=np.int64)
+    tax_cents, tip_cents = allocate(charges, np.repeat(subtotals[:, None], 2, axis=1)).T
+
+    computed = subtotals + tax_cents + tip_cents
+    adjustment = np.zeros(n, dtype=np.int64)
+    if total_amount is not None and items:
+        target = to_cents(total_amount)
+        if target < 0:
+            raise SplitConfigError("Bill total must not be negative")
+        adjustment = allocate([target], computed[:, None])[:, 0] - computed
+
+    return SplitResult(
+        participants=list(participants),
+        item_cents=item_cents if items else np.zeros((n, 0), dtype=np.int64),
+        tax_cents=tax_cents,
+        tip_cents=tip_cents,
+        adjustment_cents=adjustment,
+        total_cents=computed + adjustment,
+    )
@@ -0,0 +1,21 @@
+import os
+
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import app
+from utils.memory_client import MemoryClient
+from utils.cache import clear_caches
+from utils.rate_limit import rate_limit_store
+
+
+@pytest.fixture
+def client():
+    MemoryClient().reset()
+    clear_caches()
+    rate_limit_store.clear()
+    with TestClient(app) as c:
+        yield c
@@ -0,0 +1,11 @@
+# helpers.py
+
+
+def create_session(client, user_id="alice"):
+    res = client.post("/sessions/create", json={
+        "vendor_id": "vendor_001",
+        "session_name": "Friday dinner",
+        "created_by": user_id,
+    })
+    assert res.status_code == 200
+    return res.json()["session"]
@@ -1 +1,170 @@
 # test_auth.py
+import email
+import socket
+import time
+
+import pytest
+
+from passlib.context import CryptContext
+
+from utils.memory_client import MemoryClient
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def inbox(monkeypatch):
+    pytest.importorskip("aiosmtpd")
+    from aiosmtpd.controller import Controller
+
+    handler = Inbox()
+    port = free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    monkeypatch.setenv("SMTP_HOST", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(port))
+    monkeypatch.setenv("SMTP_STARTTLS", "false")
+    monkeypatch.delenv("PASSWORD", raising=False)
+    yield handler
+    controller.stop()
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_signup_queues_otp_email(client, inbox):
+    res = client.post("/auth/signup", json={
+        "full_name": "Alice Moyo",
+        "email": "alice@example.com",
+        "phone": "0123456789",
+        "password": "s3cret",
+    })
+    assert res.status_code == 200
+    otp = res.json()["otp"]
+
+    assert wait_for(lambda: inbox.messages)
+    assert inbox.messages[0].rcpt_tos == ["alice@example.com"]
+    message = email.message_from_bytes(inbox.messages[0].content)
+    assert otp in message.get_payload()[0].get_payload(decode=True).decode()
+    assert client.get("/mail/stats").json()["sent"] >= 1
+
+
+def add_verified_user(email, password, rounds=4):
+    users = MemoryClient().documents("appdata", "users")
+    users[f"user::{email}"] = {
+        "user_id": f"user::{email}",
+        "full_name": "Bob",
+        "email": email,
+        "password": CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds).hash(password),
+        "verified": True,
+    }
+    return users
+
+
+def test_login_rehashes_password_when_cost_factor_changes(client):
+    users = add_verified_user("bob@example.com", "s3cret", rounds=5)
+
+    res = client.post("/auth/login", json={"email": "bob@example.com", "password": "s3cret"})
+    assert res.status_code == 200
+    assert users["user::bob@example.com"]["password"].startswith("$2b$04$")
+    assert client.get("/hasher/stats").json()["rehashed"] >= 1
+
+    bad = client.post("/auth/login", json={"email": "bob@example.com", "password": "wrong"})
+    assert bad.status_code == 401
+
+
+def test_me_and_refresh_use_token_claims(client):
+    users = add_verified_user("carol@example.com", "pw")
+    tokens = client.post("/auth/login", json={"email": "carol@example.com", "password": "pw"}).json()
+
+    # /me is served from the token alone
+    del users["user::carol@example.com"]
+    me = client.get("/auth/me", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert me.status_code == 200
+    assert me.json()["email"] == "carol@example.com"
+
+    assert client.get("/auth/me", headers={"Authorization": f"Bearer {tokens['refresh_token']}"}).status_code == 401
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["access_token"]}).status_code == 401
+
+
+def test_auth_checks_never_use_a_stale_cached_user(client):
+    users = add_verified_user("erin@example.com", "old")
+    assert client.post("/auth/login", json={"email": "erin@example.com", "password": "wrong"}).status_code == 401
+
+    # another worker changes the password; this worker's cache never saw the write
+    users["user::erin@example.com"]["password"] = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("new")
+
+    assert client.post("/auth/login", json={"email": "erin@example.com", "password": "old"}).status_code == 401
+    assert client.post("/auth/login", json={"email": "erin@example.com", "password": "new"}).status_code == 200
+
+
+def test_auth_lookups_never_use_the_query_service(client, monkeypatch):
+    from routes.auth_routes import users as user_model
+
+    async def no_queries(*args, **kwargs):
+        raise AssertionError("auth must resolve users with KV reads only")
+
+    monkeypatch.setattr(user_model.store, "query", no_queries)
+    signup = client.post("/auth/signup", json={
+        "full_name": "Fay", "email": "fay@example.com", "phone": "555", "password": "pw",
+    })
+    assert signup.status_code == 200
+    assert client.post("/auth/forgot-password", json={"email": "nobody@example.com"}).status_code == 404
+
+
+def test_password_reset_resolves_legacy_user_key_after_backfill(client):
+    import asyncio
+    from models.user_model import UserModel
+
+    users = MemoryClient().documents("appdata", "users")
+    users["legacy-42"] = {"user_id": "legacy-42", "full_name": "Dan", "email": "dan@example.com", "verified": True}
+    assert client.post("/auth/forgot-password", json={"email": "dan@example.com"}).status_code == 404
+
+    assert asyncio.run(UserModel().backfill_email_lookups()) == 1
+    assert users["email::dan@example.com"]["user_id"] == "legacy-42"
+
+    assert client.post("/auth/forgot-password", json={"email": "dan@example.com"}).status_code == 200
+    otp = users["legacy-42"]["reset_otp"]
+
+    res = client.post("/auth/reset-password", json={"email": "dan@example.com", "otp": otp, "new_password": "n3w"})
+    assert res.status_code == 200
+    assert "id" not in users["legacy-42"]
+    assert client.post("/auth/login", json={"email": "dan@example.com", "password": "n3w"}).status_code == 200
+
+
+def test_login_is_rate_limited_per_email_with_retry_after(client):
+    add_verified_user("dave@example.com", "pw")
+
+    statuses = [
+        client.post("/auth/login", json={"email": "dave@example.com", "password": "guess"}).status_code
+        for _ in range(6)
+    ]
+    assert statuses == [401] * 5 + [429]
+
+    limited = client.post("/auth/login", json={"email": "Dave@Example.com", "password": "pw"})
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 1
+
+    # other accounts behind the same IP are unaffected
+    add_verified_user("erin@example.com", "pw")
+    assert client.post("/auth/login", json={"email": "erin@example.com", "password": "pw"}).status_code == 200
+    assert client.get("/ratelimit/stats").json()["rejections"]["login:email"] >= 2
@@ -1 +1,119 @@
 # test_bills.py
+from tests.helpers import create_session
+from utils.memory_client import MemoryClient
+
+
+def test_get_missing_bill_returns_404(client):
+    assert client.get("/bills/does-not-exist").status_code == 404
+
+
+def test_create_bill_writes_one_split_per_participant(client):
+    session = create_session(client)
+    client.post("/sessions/join", json={"session_id": session["session_id"], "user_id": "bob"})
+
+    res = client.post("/bills/create", json={
+        "session_id": session["session_id"],
+        "vendor_id": "vendor_001",
+        "total_amount": 40.0,
+        "currency": "USD",
+        "items": [{"name": "Pizza", "price": 40.0}],
+    })
+    assert res.status_code == 200
+    body = res.json()
+    assert sorted(s["user_id"] for s in body["splits"]) == ["alice", "bob"]
+
+    stored = client.get(f"/splits/bill/{body['bill']['bill_id']}").json()
+    assert len(stored) == 2
+
+
+def test_auto_splits_see_a_join_made_by_another_worker(client):
+    session = create_session(client)
+    client.get(f"/sessions/{session['session_id']}")  # cached in this worker
+
+    # another worker adds bob; this worker's cache never saw the write
+    MemoryClient().documents("appdata", "bill_sessions")[session["session_id"]]["participants"].append("bob")
+
+    res = client.post("/bills/create", json={
+        "session_id": session["session_id"],
+        "vendor_id": "vendor_001",
+        "total_amount": 20.0,
+        "currency": "USD",
+        "items": [],
+    })
+    assert sorted(s["user_id"] for s in res.json()["splits"]) == ["alice", "bob"]
+
+
+def test_auto_split_bill_for_missing_session_is_rejected(client):
+    bill = {"session_id": "nope", "vendor_id": "vendor_001", "total_amount": 10.0, "currency": "USD", "items": []}
+
+    assert client.post("/bills/create", json=bill).status_code == 404
+    assert client.get("/bills/session/nope").json() == []
+
+    body = client.post("/bills/batch", json=[bill]).json()
+    assert body["results"][0]["error"] == "Session not found"
+    assert client.get("/bills/session/nope").json() == []
+
+
+def test_bill_is_not_stored_when_its_splits_fail(client, monkeypatch):
+    from routes.bill_routes import get_bill_service
+
+    session = create_session(client)
+    split_db = get_bill_service().split_service.split_db
+
+    async def failing_upsert_multi(docs):
+        return {key: RuntimeError("timeout") for key in docs}
+
+    monkeypatch.setattr(split_db, "upsert_multi", failing_upsert_multi)
+    res = client.post("/bills/create", json={
+        "session_id": session["session_id"],
+        "vendor_id": "vendor_001",
+        "total_amount": 40.0,
+        "currency": "USD",
+        "items": [],
+    })
+    assert res.status_code == 500
+    assert client.get(f"/bills/session/{session['session_id']}").json() == []
+
+
+def test_bill_batch_reports_per_bill_results(client):
+    session = create_session(client)
+    good = {
+        "session_id": session["session_id"],
+        "vendor_id": "vendor_001",
+        "total_amount": 9.0,
+        "currency": "USD",
+        "items": [],
+    }
+    bad_mode = {**good, "split_mode": "by_vibes"}
+    missing_total = {k: v for k, v in good.items() if k != "total_amount"}
+
+    res = client.post("/bills/batch", json=[good, bad_mode, missing_total, good, "not a bill"])
+    assert res.status_code == 200
+    body = res.json()
+    assert (body["created"], body["failed"]) == (2, 3)
+    assert [r["status"] for r in body["results"]] == ["created", "error", "error", "created", "error"]
+    assert [r["index"] for r in body["results"]] == [0, 1, 2, 3, 4]
+
+    bills = client.get(f"/bills/session/{session['session_id']}").json()
+    assert len(bills) == 2
+    bill_id = body["results"][0]["bill"]["bill_id"]
+    assert len(client.get(f"/splits/bill/{bill_id}").json()) == 1
+
+
+def test_bill_batch_stream_accepts_ndjson(client):
+    import json
+
+    session = create_session(client)
+    lines = [
+        json.dumps({"session_id": session["session_id"], "vendor_id": "v", "total_amount": i + 1.0,
+                    "currency": "USD", "items": []})
+        for i in range(5)
+    ]
+    lines.insert(2, "{not json")
+    res = client.post("/bills/batch/stream", content="\n".join(lines) + "\n",
+                      headers={"Content-Type": "application/x-ndjson"})
+    assert res.status_code == 200
+    results = [json.loads(line) for line in res.text.splitlines()]
+    assert [r["index"] for r in results] == list(range(6))
+    assert [r["status"] for r in results].count("created") == 5
+    assert results[2]["status"] == "error"
@@ -0,0 +1,88 @@
+# test_idempotency.py
+import pytest
+
+
+def test_idempotency_key_replays_the_first_response(client):
+    payment = {
+        "session_id": "s1",
+        "vendor_id": "vendor_001",
+        "total_amount": 12.0,
+        "currency": "USD",
+        "participants": [{"user_id": "alice", "amount": 12.0}],
+    }
+    headers = {"Idempotency-Key": "retry-me"}
+
+    first = client.post("/payments/create", json=payment, headers=headers)
+    retry = client.post("/payments/create", json=payment, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert len(client.get("/payments/session/s1").json()) == 1
+
+    reused = client.post("/payments/create", json={**payment, "total_amount": 99.0}, headers=headers)
+    assert reused.status_code == 422
+
+    client.post("/payments/create", json=payment, headers={"Idempotency-Key": "another"})
+    assert len(client.get("/payments/session/s1").json()) == 2
+
+
+def test_concurrent_retries_share_one_execution(client):
+    import asyncio
+    import httpx
+    from app import app
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(
+                http.post("/sessions/create", headers={"Idempotency-Key": "tap-tap-tap"}, json={
+                    "vendor_id": "vendor_001", "session_name": "Lunch", "created_by": "alice",
+                })
+                for _ in range(5)
+            ))
+
+    responses = asyncio.run(burst())
+    assert {r.json()["session"]["session_id"] for r in responses} == {responses[0].json()["session"]["session_id"]}
+    assert len(client.get("/sessions/").json()) == 1
+
+
+def test_concurrent_request_with_different_body_is_rejected(client):
+    import asyncio
+    from utils.idempotency import IdempotencyConflict, IdempotencyStore
+
+    store = IdempotencyStore()
+    runs = []
+
+    def responder(status_code, delay=0):
+        async def execute():
+            runs.append(status_code)
+            await asyncio.sleep(delay)
+            return {"status_code": status_code, "headers": [], "body": str(status_code)}
+        return execute
+
+    async def different_bodies():
+        return await asyncio.gather(
+            store.run("k1", "fp-A", responder(200, delay=0.05)),
+            store.run("k1", "fp-B", responder(201)),
+            return_exceptions=True,
+        )
+
+    first, second = asyncio.run(different_bodies())
+    assert first == ({"status_code": 200, "headers": [], "body": "200"}, False)
+    assert isinstance(second, IdempotencyConflict) and second.status_code == 422
+
+    async def failure_then_retry():
+        return await asyncio.gather(
+            store.run("k2", "fp", responder(500, delay=0.05)),
+            store.run("k2", "fp", responder(200)),
+        )
+
+    runs.clear()
+    (failed, failed_replayed), (retried, retried_replayed) = asyncio.run(failure_then_retry())
+    assert (failed["status_code"], failed_replayed) == (500, False)
+    # the waiter does not get the 500 replayed; it runs the request itself
+    assert (retried["status_code"], retried_replayed) == (200, False)
+    assert runs == [500, 200]
+
+    with pytest.raises(IdempotencyConflict):
+        asyncio.run(store.run("k2", "fp-other", responder(200)))
@@ -0,0 +1,30 @@
+# test_loadtest.py
+import argparse
+import asyncio
+
+from loadtest import run
+from utils.cache import clear_caches
+from utils.memory_client import MemoryClient
+from utils.rate_limit import rate_limit_store
+
+
+def test_every_scenario_runs_cleanly_against_the_memory_backend():
+    MemoryClient().reset()
+    clear_caches()
+    rate_limit_store.clear()
+    args = argparse.Namespace(users=6, sessions=2, bills_per_session=2, concurrency=4, seed=7)
+
+    reports = asyncio.run(run(args))
+
+    assert list(reports) == [
+        "signup_login_burst", "session_create_join_storm", "bill_creation_auto_splits",
+        "split_approval_wave", "payment_processing",
+    ]
+    for report in reports.values():
+        for endpoint, stats in report["endpoints"].items():
+            assert stats["errors"] == 0, (endpoint, stats["statuses"])
+            assert stats["p50"] <= stats["p95"] <= stats["p99"] <= stats["max"]
+    assert reports["signup_login_burst"]["endpoints"]["POST /auth/login"]["count"] == 6
+    assert reports["session_create_join_storm"]["endpoints"]["POST /sessions/join"]["count"] == 6
+    assert reports["bill_creation_auto_splits"]["endpoints"]["POST /bills/create"]["count"] == 4
+    assert reports["payment_processing"]["endpoints"]["POST /payments/{payment_id}/process"]["count"] == 2
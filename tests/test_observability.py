@@ -0,0 +1,44 @@
+# test_observability.py
+from tests.helpers import create_session
+
+
+def test_metrics_label_routes_and_collections(client):
+    session = create_session(client)
+    client.get(f"/sessions/{session['session_id']}")
+    client.get("/bills/missing")
+
+    text = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="/sessions/{session_id}",status="200"}' in text
+    assert 'http_requests_total{method="GET",route="/bills/{bill_id}",status="404"}' in text
+    assert 'db_operation_duration_seconds_count{collection="bill_sessions",op="upsert"}' in text
+    assert 'db_operation_errors_total{collection="bills",error="DocumentNotFoundException",op="get"}' in text
+
+
+def test_request_is_traced_through_services_and_storage(client):
+    from utils.tracing import tracer, InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    tracer.use_exporter(exporter)
+    try:
+        session = create_session(client)
+        res = client.post("/bills/create", headers={"X-Request-ID": "req-42"}, json={
+            "session_id": session["session_id"],
+            "vendor_id": "vendor_001",
+            "total_amount": 10.0,
+            "currency": "USD",
+            "items": [],
+        })
+        assert res.headers["X-Request-ID"] == "req-42"
+
+        spans = client.get("/traces", params={"request_id": "req-42"}).json()
+    finally:
+        tracer.use_exporter(None)
+
+    names = {s["name"] for s in spans}
+    assert {"POST /bills/create", "BillService.create_bill", "AISplitService.build_splits",
+            "db.upsert", "db.upsert_multi"} <= names
+    root = next(s for s in spans if s["name"] == "POST /bills/create")
+    assert root["parent_id"] is None
+    assert root["attributes"]["http.status_code"] == 200
+    assert all(s["trace_id"] == root["trace_id"] for s in spans)
+    assert client.get("/").headers["X-Request-ID"]
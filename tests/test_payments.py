@@ -0,0 +1,45 @@
+# test_payments.py
+
+
+def create_payment(client, session_id="s1"):
+    res = client.post("/payments/create", json={
+        "session_id": session_id,
+        "vendor_id": "vendor_001",
+        "total_amount": 30.0,
+        "currency": "USD",
+        "participants": [{"user_id": "alice", "amount": 30.0}],
+    })
+    assert res.status_code == 200
+    return res.json()["payment"]
+
+
+def test_payment_is_processed_only_once(client):
+    payment = create_payment(client)
+
+    first = client.post(f"/payments/{payment['payment_id']}/process")
+    assert first.status_code == 200
+    assert first.json()["payment"]["payment_status"] == "processed"
+
+    second = client.post(f"/payments/{payment['payment_id']}/process")
+    assert second.status_code == 409
+    stored = client.get("/payments/session/s1").json()[0]
+    assert stored["processed_at"] == first.json()["payment"]["processed_at"]
+
+
+def test_processing_missing_payment_returns_404(client):
+    assert client.post("/payments/payment::missing/process").status_code == 404
+
+
+def test_list_payments_for_session_filters_by_session(client):
+    for session_id in ("s1", "s1", "s2"):
+        client.post("/payments/create", json={
+            "session_id": session_id,
+            "vendor_id": "vendor_001",
+            "total_amount": 30.0,
+            "currency": "USD",
+            "participants": [{"user_id": "alice", "amount": 30.0}],
+        })
+
+    rows = client.get("/payments/session/s1").json()
+    assert len(rows) == 2
+    assert {r["session_id"] for r in rows} == {"s1"}
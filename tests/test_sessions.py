@@ -0,0 +1,165 @@
+# test_sessions.py
+from tests.helpers import create_session
+
+
+def test_join_session_adds_participant(client):
+    session = create_session(client)
+
+    res = client.post("/sessions/join", json={"session_id": session["session_id"], "user_id": "bob"})
+    assert res.status_code == 200
+
+    stored = client.get(f"/sessions/{session['session_id']}").json()
+    assert stored["participants"] == ["alice", "bob"]
+
+
+def test_session_reads_are_cached_and_invalidated_on_join(client):
+    session = create_session(client)
+    session_id = session["session_id"]
+
+    client.get(f"/sessions/{session_id}")
+    client.get(f"/sessions/{session_id}")
+    stats = client.get("/cache/stats").json()
+    sessions = next(v for k, v in stats.items() if k.endswith("`bill_sessions`"))
+    assert sessions["hits"] >= 1
+
+    client.post("/sessions/join", json={"session_id": session_id, "user_id": "bob"})
+    assert client.get(f"/sessions/{session_id}").json()["participants"] == ["alice", "bob"]
+
+
+def test_list_sessions_pages_with_cursor_and_streams_ndjson(client):
+    ids = [create_session(client, user_id=f"user{i}")["session_id"] for i in range(5)]
+
+    first = client.get("/sessions/", params={"limit": 2})
+    second = client.get("/sessions/", params={"limit": 2, "cursor": first.headers["x-next-cursor"]})
+    last = client.get("/sessions/", params={"limit": 2, "cursor": second.headers["x-next-cursor"]})
+    assert "x-next-cursor" not in last.headers
+
+    paged = [row["session_id"] for res in (first, second, last) for row in res.json()]
+    assert sorted(paged) == sorted(ids)
+    assert len(set(paged)) == 5
+
+    mine = client.get("/sessions/", params={"participant": "user3"}).json()
+    assert [row["session_id"] for row in mine] == [ids[3]]
+
+    streamed = client.get("/sessions/", params={"format": "ndjson", "status": "open"})
+    assert streamed.headers["content-type"].startswith("application/x-ndjson")
+    assert len(streamed.text.strip().splitlines()) == 5
+
+
+def test_session_cursor_breaks_created_at_ties_and_skips_undated_rows(client):
+    import asyncio
+    from utils.memory_client import MemoryClient
+
+    db = MemoryClient().get_collection("appdata", "bill_sessions")
+    docs = {f"session::{i}": {"session_id": f"session::{i}", "status": "open", "participants": [],
+                              "created_at": "2025-01-01T00:00:00"} for i in range(4)}
+    docs["session::undated"] = {"session_id": "session::undated", "status": "open", "participants": []}
+    asyncio.run(db.upsert_multi(docs))
+
+    first = client.get("/sessions/", params={"limit": 3})
+    rest = client.get("/sessions/", params={"limit": 3, "cursor": first.headers["x-next-cursor"]})
+    paged = [row["session_id"] for res in (first, rest) for row in res.json()]
+    assert paged == ["session::3", "session::2", "session::1", "session::0"]
+
+
+def test_join_retries_when_session_changes_underneath(client, monkeypatch):
+    import asyncio
+    from utils.memory_client import MemoryClient
+    from utils.optimistic import contention_stats
+
+    session = create_session(client)
+    db = MemoryClient().get_collection("appdata", "bill_sessions")
+    get_with_cas = db.get_with_cas
+    raced = []
+
+    # another writer joins between our read and our CAS-guarded write, once
+    async def racing_get_with_cas(self, key):
+        result = await get_with_cas(key)
+        if not raced:
+            raced.append(key)
+            await db.mutate_in(key, [("array_addunique", "participants", "carol")])
+        return result
+
+    monkeypatch.setattr(type(db), "get_with_cas", racing_get_with_cas)
+    conflicts = contention_stats.conflicts
+
+    res = client.post("/sessions/join", json={"session_id": session["session_id"], "user_id": "bob"})
+    assert res.status_code == 200
+    assert contention_stats.conflicts == conflicts + 1
+
+    stored = asyncio.run(db.get(session["session_id"]))
+    assert stored["participants"] == ["alice", "carol", "bob"]
+
+
+def test_session_snapshot_aggregates_and_honours_etag(client):
+    session = create_session(client)
+    session_id = session["session_id"]
+    client.post("/sessions/join", json={"session_id": session_id, "user_id": "bob"})
+    bill = client.post("/bills/create", json={
+        "session_id": session_id,
+        "vendor_id": "vendor_001",
+        "total_amount": 20.0,
+        "currency": "USD",
+        "items": [{"name": "Pizza", "price": 20.0}],
+    }).json()["bill"]
+    client.post("/payments/create", json={
+        "session_id": session_id,
+        "vendor_id": "vendor_001",
+        "total_amount": 20.0,
+        "currency": "USD",
+        "participants": [{"user_id": "alice", "amount": 20.0}],
+    })
+
+    res = client.get(f"/sessions/{session_id}/snapshot")
+    assert res.status_code == 200
+    snapshot = res.json()
+    assert snapshot["session"]["participants"] == ["alice", "bob"]
+    assert [b["bill_id"] for b in snapshot["bills"]] == [bill["bill_id"]]
+    assert {s["user_id"] for s in snapshot["bills"][0]["splits"]} == {"alice", "bob"}
+    assert len(snapshot["payments"]) == 1
+
+    etag = res.headers["ETag"]
+    unchanged = client.get(f"/sessions/{session_id}/snapshot", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == etag
+
+    split_id = snapshot["bills"][0]["splits"][0]["split_id"]
+    owner = snapshot["bills"][0]["splits"][0]["user_id"]
+    client.post(f"/splits/{split_id}/approve", json={"user_id": owner})
+    changed = client.get(f"/sessions/{session_id}/snapshot", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_snapshot_of_missing_session_returns_404(client):
+    assert client.get("/sessions/nope/snapshot").status_code == 404
+
+
+def test_session_events_are_pushed_over_websocket(client):
+    session = create_session(client)
+    session_id = session["session_id"]
+
+    with client.websocket_connect(f"/sessions/{session_id}/ws") as ws:
+        client.post("/sessions/join", json={"session_id": session_id, "user_id": "bob"})
+        joined = ws.receive_json()
+        assert joined["type"] == "session.joined"
+        assert joined["data"]["user_id"] == "bob"
+
+        bill = client.post("/bills/create", json={
+            "session_id": session_id,
+            "vendor_id": "vendor_001",
+            "total_amount": 10.0,
+            "currency": "USD",
+            "items": [],
+        }).json()["bill"]
+        created = ws.receive_json()
+        assert created["type"] == "bill.created"
+        assert created["data"]["bill"]["bill_id"] == bill["bill_id"]
+
+        split = created["data"]["splits"][0]
+        client.post(f"/splits/{split['split_id']}/approve", json={"user_id": split["user_id"]})
+        approved = ws.receive_json()
+        assert approved["type"] == "split.approved"
+        assert approved["data"]["approval_status"] == "approved"
+
+    assert client.get("/events/stats").json()["subscribers"] == 0
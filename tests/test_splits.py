@@ -0,0 +1,134 @@
+# test_splits.py
+from tests.helpers import create_session
+
+
+def test_manual_splits_are_indexed_on_the_bill(client):
+    bill = client.post("/bills/create", json={
+        "session_id": "s1",
+        "vendor_id": "vendor_001",
+        "total_amount": 25.0,
+        "currency": "USD",
+        "items": [],
+        "manual_split": True,
+    }).json()["bill"]
+
+    saved = client.post(f"/splits/manual/{bill['bill_id']}", json=[
+        {"user_id": "alice", "amount": 10.0},
+        {"user_id": "bob", "amount": 15.0},
+    ]).json()["splits"]
+
+    stored_bill = client.get(f"/bills/{bill['bill_id']}").json()
+    assert stored_bill["split_ids"] == [s["split_id"] for s in saved]
+    assert client.get(f"/splits/bill/{bill['bill_id']}").json() == saved
+
+
+def test_concurrent_manual_splits_are_all_indexed(client):
+    import asyncio
+    import httpx
+    from app import app
+
+    bill = client.post("/bills/create", json={
+        "session_id": "s1", "vendor_id": "vendor_001", "total_amount": 50.0,
+        "currency": "USD", "items": [], "manual_split": True,
+    }).json()["bill"]
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(
+                http.post(f"/splits/manual/{bill['bill_id']}", json=[{"user_id": f"user{i}", "amount": 10.0}])
+                for i in range(5)
+            ))
+
+    saved = [r.json()["splits"][0]["split_id"] for r in asyncio.run(burst())]
+    stored_bill = client.get(f"/bills/{bill['bill_id']}").json()
+    assert sorted(stored_bill["split_ids"]) == sorted(saved)
+    assert len(client.get(f"/splits/bill/{bill['bill_id']}").json()) == 5
+
+
+def test_manual_splits_for_missing_bill_return_404(client):
+    res = client.post("/splits/manual/missing", json=[{"user_id": "alice", "amount": 10.0}])
+    assert res.status_code == 404
+    assert client.get("/splits/bill/missing").json() == []
+
+
+def test_approve_split_checks_owner_and_updates_in_place(client):
+    session = create_session(client)
+    bill = client.post("/bills/create", json={
+        "session_id": session["session_id"],
+        "vendor_id": "vendor_001",
+        "total_amount": 12.0,
+        "currency": "USD",
+        "items": [],
+    }).json()
+    split = bill["splits"][0]
+
+    assert client.post(f"/splits/{split['split_id']}/approve", json={"user_id": "mallory"}).status_code == 403
+
+    res = client.post(f"/splits/{split['split_id']}/approve", json={"user_id": "alice"})
+    assert res.status_code == 200
+    stored = client.get(f"/splits/bill/{bill['bill']['bill_id']}").json()[0]
+    assert stored["approval_status"] == "approved"
+    assert stored["approved_at"] == res.json()["split"]["approved_at"]
+
+
+def test_item_level_splits_are_exact_to_the_cent(client):
+    session = create_session(client)
+    session_id = session["session_id"]
+    for user_id in ("bob", "carol"):
+        client.post("/sessions/join", json={"session_id": session_id, "user_id": user_id})
+
+    res = client.post("/bills/create", json={
+        "session_id": session_id,
+        "vendor_id": "vendor_001",
+        "total_amount": 100.0,
+        "currency": "USD",
+        "items": [
+            {"name": "Pizza", "price": 25.0, "quantity": 2, "assigned_to": ["alice", "bob"]},
+            {"name": "Wine", "price": 33.33, "assigned_to": ["carol"]},
+            {"name": "Bread", "price": 4.0},
+        ],
+        "split_mode": "by_item",
+        "tip_percent": 10,
+    })
+    assert res.status_code == 200
+    splits = {s["user_id"]: s for s in res.json()["splits"]}
+
+    assert round(sum(s["amount"] for s in splits.values()), 2) == 100.0
+    assert {i["name"] for i in splits["carol"]["items"]} == {"Wine", "Bread"}
+    assert splits["alice"]["items"] == [{"name": "Pizza", "amount": 25.0}, {"name": "Bread", "amount": 1.34}]
+    # 10% tip on 87.33 of items, spread by subtotal
+    assert round(sum(s["tip_amount"] for s in splits.values()), 2) == 8.73
+
+
+def test_split_preview_uses_largest_remainder_and_validates(client):
+    res = client.post("/splits/preview", json={
+        "participants": ["alice", "bob", "carol"],
+        "total_amount": 10.0,
+        "split_mode": "weighted",
+        "weights": {"alice": 2},
+    })
+    assert res.status_code == 200
+    assert [s["amount"] for s in res.json()["shares"]] == [5.0, 2.5, 2.5]
+
+    res = client.post("/splits/preview", json={"participants": ["alice", "bob", "carol"], "total_amount": 0.1})
+    assert [s["amount"] for s in res.json()["shares"]] == [0.04, 0.03, 0.03]
+
+    res = client.post("/splits/preview", json={
+        "participants": ["alice", "bob"],
+        "items": [{"name": "Soup", "price": 3.0, "assigned_to": ["mallory"]}],
+        "split_mode": "by_item",
+    })
+    assert res.status_code == 400
+
+
+def test_splits_for_missing_bill_skip_the_query_service(client, monkeypatch):
+    import models.split_model
+
+    async def no_queries(*args, **kwargs):
+        raise AssertionError("a missing bill must not fall back to N1QL")
+
+    monkeypatch.setattr(models.split_model, "run_query", no_queries)
+    response = client.get("/splits/bill/no-such-bill")
+    assert response.status_code == 200
+    assert response.json() == []
@@ -0,0 +1,148 @@
+# test_storage.py
+import asyncio
+import os
+
+import pytest
+
+from utils import couchbase_client
+from utils.couchbase_client import AsyncCouchbaseClient
+from utils.health import storage_health
+from utils.memory_client import MemoryClient
+
+
+class FakeCollection:
+    def __init__(self, cluster):
+        self.cluster = cluster
+
+
+class FakeBucket:
+    def __init__(self, cluster):
+        self.cluster = cluster
+
+    async def on_connect(self):
+        pass
+
+    def scope(self, name):
+        return self
+
+    def collection(self, name):
+        return FakeCollection(self.cluster)
+
+
+class FakeCluster:
+    connects = 0
+
+    def __init__(self):
+        FakeCluster.connects += 1
+        self.closed = False
+
+    async def wait_until_ready(self, timeout):
+        pass
+
+    def bucket(self, name):
+        return FakeBucket(self)
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_cluster(monkeypatch):
+    async def connect(conn_str, options):
+        return FakeCluster()
+
+    monkeypatch.setattr(couchbase_client.AsyncCluster, "connect", connect)
+    monkeypatch.setattr(couchbase_client, "PasswordAuthenticator", lambda *a: None)
+    FakeCluster.connects = 0
+    client = AsyncCouchbaseClient()
+    client._reset()
+    yield client
+    client._reset()
+
+
+def test_collections_resolve_lazily_per_event_loop(fake_cluster):
+    collection = couchbase_client.AsyncCollection(fake_cluster, "appdata", "bills")
+    assert FakeCluster.connects == 0
+
+    first = asyncio.run(collection._resolve())
+    assert asyncio.run(fake_cluster.connect()) is not None
+    second = asyncio.run(collection._resolve())
+
+    # every loop gets its own connection and the collection follows it
+    assert FakeCluster.connects == 3
+    assert first.cluster is not second.cluster
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_worker_does_not_inherit_the_connection(fake_cluster):
+    async def connect_and_fork():
+        await fake_cluster.connect()
+        return os.fork()
+
+    pid = asyncio.run(connect_and_fork())
+    if pid == 0:
+        os._exit(0 if fake_cluster.bucket is None and fake_cluster.cluster is None else 1)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert fake_cluster.bucket is not None
+
+
+def test_readiness_pings_storage_at_most_once_per_ttl(client, monkeypatch):
+    pings = []
+
+    async def failing_ping():
+        pings.append(1)
+        raise ConnectionError("cluster unreachable")
+
+    monkeypatch.setattr(storage_health, "_result", None)
+    monkeypatch.setattr(MemoryClient(), "ping", failing_ping, raising=False)
+
+    for _ in range(5):
+        response = client.get("/readyz")
+        assert response.status_code == 503
+    assert response.json()["storage"]["error"] == "ConnectionError: cluster unreachable"
+    assert len(pings) == 1
+
+    # liveness only reports the cached result, it never pings
+    health = client.get("/healthz")
+    assert health.status_code == 200
+    assert health.json()["storage"]["ok"] is False
+    assert len(pings) == 1
+
+    monkeypatch.undo()
+    assert client.get("/readyz").json()["status"] == "ready"
+
+
+def test_get_multi_overlapping_a_write_does_not_cache_the_old_document():
+    from utils.cache import CachedCollection, TTLCache
+
+    class SlowCollection:
+        def __init__(self):
+            self.doc = {"v": 1}
+            self.release = None
+
+        async def get_multi(self, keys):
+            snapshot = dict(self.doc)
+            await self.release.wait()
+            return {"k": snapshot}
+
+        async def get(self, key):
+            return dict(self.doc)
+
+        async def upsert(self, key, value, expiry=None):
+            self.doc = value
+
+    async def scenario():
+        raw = SlowCollection()
+        raw.release = asyncio.Event()
+        db = CachedCollection(raw, TTLCache(ttl=60))
+
+        reading = asyncio.ensure_future(db.get_multi(["k"]))
+        await asyncio.sleep(0)
+        await db.upsert("k", {"v": 2})
+        raw.release.set()
+        assert await reading == {"k": {"v": 1}}
+        return await db.get("k")
+
+    assert asyncio.run(scenario()) == {"v": 2}
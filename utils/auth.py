@@ -0,0 +1,36 @@
+import hashlib
+import os
+import time
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordBearer
+
+from utils.cache import named_cache
+from utils.jwt_helper import verify_access_token
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+
+# sha256(token) -> verified claims, kept until the token's exp
+_verified_tokens = named_cache("auth_tokens", ttl=0, max_entries=int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000")))
+
+
+def verify_access_token_cached(token: str) -> dict:
+    key = hashlib.sha256(token.encode()).hexdigest()
+    claims = _verified_tokens.get(key)
+    if claims is None:
+        claims = verify_access_token(token)
+        _verified_tokens.set(key, claims, ttl=claims["exp"] - time.time())
+    return claims
+
+
+async def get_current_claims(token: str = Depends(oauth2_scheme)) -> dict:
+    """
+    FastAPI dependency: verified access-token claims for the caller.
+    """
+    try:
+        claims = verify_access_token_cached(token)
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=str(e) or "Invalid token")
+
+    if not claims.get("sub"):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return claims
@@ -0,0 +1,219 @@
+import asyncio
+import copy
+import os
+import time
+from collections import OrderedDict
+
+from couchbase.exceptions import DocumentNotFoundException
+
+# Seconds a cached document stays fresh, per collection.
+CACHE_TTLS = {
+    "bill_sessions": float(os.getenv("CACHE_TTL_SESSIONS", "2")),
+    "bills": float(os.getenv("CACHE_TTL_BILLS", "10")),
+    "users": float(os.getenv("CACHE_TTL_USERS", "30")),
+    "vendors": float(os.getenv("CACHE_TTL_VENDORS", "300")),
+}
+DEFAULT_TTL = float(os.getenv("CACHE_TTL_DEFAULT", "5"))
+MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # key -> pending fetch; dropped on invalidate so stale reads never land
+        self.inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+        self.inflight.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+        self.inflight.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "ttl": self.ttl,
+        }
+
+
+class CachedCollection:
+    """
+    Read-through cache in front of a collection.
+    Gets are served from the cache while fresh; writes invalidate the key.
+    Concurrent misses for the same key share a single fetch.
+    """
+
+    def __init__(self, collection, cache: TTLCache):
+        self._collection = collection
+        self._cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def get(self, key):
+        cached = self._cache.get(key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+
+        pending = self._cache.inflight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._collection.get(key))
+            self._cache.inflight[key] = pending
+            pending.add_done_callback(lambda fut: self._fetched(key, fut))
+        doc = await asyncio.shield(pending)
+        return copy.deepcopy(doc)
+
+    def _fetched(self, key, future):
+        if self._cache.inflight.get(key) is not future:
+            return  # invalidated while the fetch was running
+        del self._cache.inflight[key]
+        if not future.cancelled() and future.exception() is None:
+            self._cache.set(key, future.result())
+
+    async def get_multi(self, keys):
+        docs = {}
+        missing = []
+        for key in keys:
+            cached = self._cache.get(key)
+            if cached is None:
+                missing.append(key)
+            else:
+                docs[key] = copy.deepcopy(cached)
+
+        if missing:
+            # one pending fetch per key, like get, so an invalidation while the
+            # batch is running keeps its stale result out of the cache
+            loop = asyncio.get_running_loop()
+            owned = {}
+            for key in missing:
+                if key not in self._cache.inflight:
+                    future = owned[key] = loop.create_future()
+                    self._cache.inflight[key] = future
+                    future.add_done_callback(lambda fut, key=key: self._fetched(key, fut))
+
+            try:
+                fetched = await self._collection.get_multi(missing)
+            except BaseException as e:
+                for future in owned.values():
+                    future.set_exception(e)
+                raise
+
+            for key, future in owned.items():
+                if key in fetched:
+                    future.set_result(fetched[key])
+                else:
+                    future.set_exception(DocumentNotFoundException(message=f"document not found: {key}"))
+            for key, doc in fetched.items():
+                docs[key] = copy.deepcopy(doc)
+        return docs
+
+    async def upsert(self, key, value, expiry=None):
+        self._cache.invalidate(key)
+        try:
+            return await self._collection.upsert(key, value, expiry=expiry)
+        finally:
+            self._cache.invalidate(key)
+
+    async def insert(self, key, value, expiry=None):
+        self._cache.invalidate(key)
+        try:
+            return await self._collection.insert(key, value, expiry=expiry)
+        finally:
+            self._cache.invalidate(key)
+
+    async def remove(self, key):
+        self._cache.invalidate(key)
+        try:
+            return await self._collection.remove(key)
+        finally:
+            self._cache.invalidate(key)
+
+    async def mutate_in(self, key, ops, cas=None):
+        self._cache.invalidate(key)
+        try:
+            return await self._collection.mutate_in(key, ops, cas=cas)
+        finally:
+            self._cache.invalidate(key)
+
+    async def upsert_multi(self, docs):
+        for key in docs:
+            self._cache.invalidate(key)
+        try:
+            return await self._collection.upsert_multi(docs)
+        finally:
+            for key in docs:
+                self._cache.invalidate(key)
+
+
+_caches = {}
+
+
+def cached(collection):
+    """
+    Wrap a collection with the shared cache for its keyspace.
+    """
+    if not CACHE_ENABLED:
+        return collection
+
+    cache = _caches.get(collection.keyspace)
+    if cache is None:
+        ttl = CACHE_TTLS.get(collection.collection_name, DEFAULT_TTL)
+        cache = _caches[collection.keyspace] = TTLCache(ttl)
+    return CachedCollection(collection, cache)
+
+
+def named_cache(name: str, ttl: float, max_entries: int = MAX_ENTRIES):
+    """
+    A standalone TTLCache reported alongside the collection caches.
+    """
+    cache = _caches.get(name)
+    if cache is None:
+        cache = _caches[name] = TTLCache(ttl, max_entries)
+    return cache
+
+
+def cache_stats():
+    return {keyspace: cache.stats() for keyspace, cache in _caches.items()}
+
+
+def clear_caches():
+    for cache in _caches.values():
+        cache.clear()
@@ -1,40 +1,224 @@
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
 from couchbase.auth import PasswordAuthenticator
-from couchbase.cluster import Cluster
-from couchbase.options import ClusterOptions
-from couchbase.exceptions import CouchbaseException
+from couchbase.diagnostics import PingState, ServiceType
+from couchbase.options import ClusterOptions, InsertOptions, MutateInOptions, PingOptions, QueryOptions, UpsertOptions
+from acouchbase.cluster import Cluster as AsyncCluster
+from couchbase.exceptions import CouchbaseException, DocumentNotFoundException
+import couchbase.subdocument as SD
+from utils.metrics import InstrumentedCollection
 from datetime import timedelta
 
 load_dotenv()
 
-class CouchbaseClient:
+logger = logging.getLogger(__name__)
+
+# op name -> sub-document spec builder, see AsyncCollection.mutate_in
+SUBDOC_OPS = {
+    "replace": SD.replace,
+    "upsert": SD.upsert,
+    "array_addunique": SD.array_addunique,
+    "remove": SD.remove,
+}
+
+
+class AsyncCollection:
+    """
+    Thin wrapper around an acouchbase collection.
+    Resolves the underlying collection on first use and returns plain dicts.
+    The handle is re-resolved whenever the client reconnects (new process or event loop).
+    """
+
+    def __init__(self, client, scope_name, collection_name):
+        self._client = client
+        self.scope_name = scope_name
+        self.collection_name = collection_name
+        self._collection = None
+        self._generation = None
+
+    @property
+    def keyspace(self):
+        return f"`{self._client.bucket_name}`.`{self.scope_name}`.`{self.collection_name}`"
+
+    async def _resolve(self):
+        if self._collection is None or self._generation != self._client.generation:
+            bucket = await self._client.connect()
+            self._collection = bucket.scope(self.scope_name).collection(self.collection_name)
+            self._generation = self._client.generation
+        return self._collection
+
+    async def get(self, key):
+        collection = await self._resolve()
+        result = await collection.get(key)
+        return result.content_as[dict]
+
+    async def get_multi(self, keys):
+        """
+        Fetches every key concurrently.
+        Returns {key: doc} for the keys that exist; missing keys are left out.
+        """
+        collection = await self._resolve()
+        keys = list(keys)
+        results = await asyncio.gather(*(collection.get(key) for key in keys), return_exceptions=True)
+
+        docs = {}
+        for key, res in zip(keys, results):
+            if isinstance(res, DocumentNotFoundException):
+                continue
+            if isinstance(res, Exception):
+                raise res
+            docs[key] = res.content_as[dict]
+        return docs
+
+    async def upsert(self, key, value, expiry=None):
+        """
+        With `expiry` (seconds) the server deletes the document once it elapses.
+        """
+        collection = await self._resolve()
+        if expiry is None:
+            return await collection.upsert(key, value)
+        return await collection.upsert(key, value, UpsertOptions(expiry=timedelta(seconds=expiry)))
+
+    async def insert(self, key, value, expiry=None):
+        """
+        Like upsert, but fails with DocumentExistsException if the key is taken.
+        """
+        collection = await self._resolve()
+        if expiry is None:
+            return await collection.insert(key, value)
+        return await collection.insert(key, value, InsertOptions(expiry=timedelta(seconds=expiry)))
+
+    async def remove(self, key):
+        collection = await self._resolve()
+        return await collection.remove(key)
+
+    async def upsert_multi(self, docs):
+        """
+        Upserts every doc concurrently.
+        Returns {key: exception} for the keys that failed (empty when all succeeded).
+        """
+        collection = await self._resolve()
+        keys = list(docs)
+        results = await asyncio.gather(
+            *(collection.upsert(key, docs[key]) for key in keys), return_exceptions=True
+        )
+        return {key: res for key, res in zip(keys, results) if isinstance(res, Exception)}
+
+    async def get_with_cas(self, key):
+        collection = await self._resolve()
+        result = await collection.get(key)
+        return result.content_as[dict], result.cas
+
+    async def mutate_in(self, key, ops, cas=None):
+        """
+        Applies sub-document ops to one document atomically, in one round-trip.
+        `ops` is a list of (op, path, *values) with op one of SUBDOC_OPS.
+        With `cas`, fails with CasMismatchException if the document changed since it was read.
+        """
+        collection = await self._resolve()
+        specs = [SUBDOC_OPS[op](path, *values) for op, path, *values in ops]
+        options = MutateInOptions(cas=cas) if cas is not None else MutateInOptions()
+        return await collection.mutate_in(key, specs, options)
+
+    async def query(self, statement, *params, prepared=False):
+        return [row async for row in self.query_iter(statement, *params, prepared=prepared)]
+
+    async def query_iter(self, statement, *params, prepared=False):
+        """
+        Yields rows as the query service streams them back.
+        prepared=True runs the statement with adhoc=False so its plan is cached server-side.
+        """
+        await self._resolve()
+        result = self._client.cluster.query(
+            statement, QueryOptions(positional_parameters=list(params), adhoc=not prepared)
+        )
+        async for row in result:
+            yield row
+
+
+class AsyncCouchbaseClient:
+    """
+    Process-wide async connection, opened by the app's lifespan (or on first use).
+
+    Nothing connects at import. The connection belongs to the process and event
+    loop that opened it: a forked worker or a new loop gets its own connection,
+    so `gunicorn --preload` never shares an SDK handle across processes.
+    """
     _instance = None
 
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(CouchbaseClient, cls).__new__(cls)
-            cls._instance.init_connection()
+            cls._instance = super(AsyncCouchbaseClient, cls).__new__(cls)
+            cls._instance.bucket_name = os.getenv("COUCHBASE_BUCKET", "b0")
+            cls._instance.generation = 0
+            cls._instance._reset()
+            os.register_at_fork(after_in_child=cls._instance._reset)
         return cls._instance
 
-    def init_connection(self):
-        try:
-            conn_str = os.getenv("COUCHBASE_CONN_STRING")
-            username = os.getenv("COUCHBASE_USERNAME")
-            password = os.getenv("COUCHBASE_PASSWORD")
-            bucket_name = os.getenv("COUCHBASE_BUCKET", "b0")
+    def _reset(self):
+        self.cluster = None
+        self.bucket = None
+        self._loop = None
+        self._lock = None
+        self.generation += 1
+
+    async def connect(self):
+        loop = asyncio.get_running_loop()
+        if self.bucket is not None and self._loop is loop:
+            return self.bucket
+
+        if self._loop is not loop:
+            # handles from another event loop can't be used here
+            self._reset()
+            self._loop = loop
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self.bucket is None:
+                try:
+                    conn_str = os.getenv("COUCHBASE_CONN_STRING")
+                    username = os.getenv("COUCHBASE_USERNAME")
+                    password = os.getenv("COUCHBASE_PASSWORD")
+
+                    auth = PasswordAuthenticator(username, password)
+                    self.cluster = await AsyncCluster.connect(conn_str, ClusterOptions(auth))
+                    await self.cluster.wait_until_ready(timedelta(seconds=10))
+
+                    bucket = self.cluster.bucket(self.bucket_name)
+                    await bucket.on_connect()
+                    self.bucket = bucket
+
+                    logger.info("Connected to Couchbase (pid %s), bucket: %s", os.getpid(), self.bucket_name)
+                except CouchbaseException as e:
+                    logger.error("Couchbase connection failed: %s", e)
+                    raise
+        return self.bucket
 
-            auth = PasswordAuthenticator(username, password)
-            self.cluster = Cluster(conn_str, ClusterOptions(auth))
-            self.cluster.wait_until_ready(timedelta(seconds=10))
+    async def ping(self):
+        """
+        Pings the KV and query services of every node.
+        Returns {"ok": bool, "services": {service: {"ok", "endpoints", "max_latency_ms"}}}.
+        """
+        await self.connect()
+        result = await self.cluster.ping(PingOptions(service_types=[ServiceType.KeyValue, ServiceType.Query]))
 
-            self.bucket = self.cluster.bucket(bucket_name)
+        services = {}
+        for service_type, reports in result.endpoints.items():
+            services[service_type.value] = {
+                "ok": bool(reports) and all(r.state == PingState.OK for r in reports),
+                "endpoints": len(reports),
+                "max_latency_ms": round(max((r.latency.total_seconds() for r in reports), default=0) * 1000, 3),
+            }
+        ok = all(name in services and services[name]["ok"] for name in ("kv", "query"))
+        return {"ok": ok, "backend": "couchbase", "services": services}
 
-            print(f"✅ Connected to Couchbase, bucket: {bucket_name}")
-        except CouchbaseException as e:
-            print(f"❌ Couchbase connection failed: {e}")
-            raise
+    async def close(self):
+        cluster = self.cluster
+        self._reset()
+        if cluster is not None:
+            await cluster.close()
 
     def get_collection(self, scope_name, collection_name):
-        scope = self.bucket.scope(scope_name)
-        return scope.collection(collection_name)
+        return InstrumentedCollection(AsyncCollection(self, scope_name, collection_name))
@@ -0,0 +1,157 @@
+import asyncio
+import importlib
+import os
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from datetime import datetime, UTC
+
+# "memory" or a "package.module:ClassName" implementing Broker
+EVENT_BROKER = os.getenv("EVENT_BROKER", "memory")
+SUBSCRIBER_MAX_PENDING = int(os.getenv("EVENT_SUBSCRIBER_MAX_PENDING", "100"))
+
+
+class Subscription(ABC):
+    """
+    Async iterator over the events published to one channel.
+    """
+
+    def __aiter__(self):
+        return self
+
+    @abstractmethod
+    async def __anext__(self) -> dict:
+        ...
+
+    @abstractmethod
+    async def close(self):
+        ...
+
+
+class Broker(ABC):
+    """
+    Fan-out transport behind the EventHub. The default keeps everything in
+    this process; multi-worker deployments plug in one backed by a shared
+    pub/sub service so every worker sees every event.
+    """
+
+    @abstractmethod
+    async def publish(self, channel: str, event: dict):
+        ...
+
+    @abstractmethod
+    async def subscribe(self, channel: str) -> Subscription:
+        ...
+
+    def stats(self):
+        return {}
+
+
+class InProcessSubscription(Subscription):
+    def __init__(self, broker, channel: str, max_pending: int):
+        self._broker = broker
+        self.channel = channel
+        self._queue = asyncio.Queue(maxsize=max_pending)
+
+    def deliver(self, event: dict) -> bool:
+        """
+        Queue an event. A slow reader loses its oldest event instead of
+        holding up publishers; returns False when that happened.
+        """
+        dropped = self._queue.full()
+        if dropped:
+            self._queue.get_nowait()
+        self._queue.put_nowait(event)
+        return not dropped
+
+    async def __anext__(self) -> dict:
+        return await self._queue.get()
+
+    async def close(self):
+        self._broker.unsubscribe(self)
+
+
+class InProcessBroker(Broker):
+    def __init__(self, max_pending: int = SUBSCRIBER_MAX_PENDING):
+        self.max_pending = max_pending
+        self._channels = {}
+        self.delivered = 0
+        self.dropped = 0
+
+    async def publish(self, channel: str, event: dict):
+        for subscription in self._channels.get(channel, ()):
+            if not subscription.deliver(event):
+                self.dropped += 1
+            self.delivered += 1
+
+    async def subscribe(self, channel: str) -> Subscription:
+        subscription = InProcessSubscription(self, channel, self.max_pending)
+        self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: InProcessSubscription):
+        subscribers = self._channels.get(subscription.channel)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._channels[subscription.channel]
+
+    def stats(self):
+        return {
+            "channels": len(self._channels),
+            "subscribers": sum(len(s) for s in self._channels.values()),
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+def load_broker(spec: str = EVENT_BROKER) -> Broker:
+    if spec == "memory":
+        return InProcessBroker()
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class EventHub:
+    """
+    Per-session pub/sub. Routes publish change events after their writes
+    succeed; the WebSocket and SSE endpoints subscribe by session id.
+    """
+
+    def __init__(self, broker: Broker = None):
+        self.broker = broker or load_broker()
+        self.published = 0
+        self.failed = 0
+
+    def use_broker(self, broker: Broker):
+        self.broker = broker
+
+    async def publish(self, session_id: str, event_type: str, data: dict):
+        if not session_id:
+            return
+        event = {
+            "type": event_type,
+            "session_id": session_id,
+            "data": data,
+            "at": datetime.now(UTC).isoformat(),
+        }
+        try:
+            await self.broker.publish(session_id, event)
+            self.published += 1
+        except Exception:
+            # a lost notification must never fail the write that caused it
+            self.failed += 1
+
+    @asynccontextmanager
+    async def subscribe(self, session_id: str):
+        subscription = await self.broker.subscribe(session_id)
+        try:
+            yield subscription
+        finally:
+            await subscription.close()
+
+    def stats(self):
+        return {"published": self.published, "failed": self.failed, **self.broker.stats()}
+
+
+event_hub = EventHub()
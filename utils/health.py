@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import os
+import time
+
+from utils.storage import get_client
+
+logger = logging.getLogger(__name__)
+
+# Probes within this many seconds of the last ping reuse its result
+HEALTH_PING_TTL = float(os.getenv("HEALTH_PING_TTL", "5"))
+HEALTH_PING_TIMEOUT = float(os.getenv("HEALTH_PING_TIMEOUT", "2"))
+
+
+class StorageHealth:
+    """
+    Cached storage pings for the liveness and readiness probes.
+
+    However often the probes are hit, the cluster is pinged at most once per
+    `ttl` seconds per process; probes arriving while a ping is running wait
+    for that ping instead of starting another.
+    """
+
+    def __init__(self, ttl: float = HEALTH_PING_TTL, timeout: float = HEALTH_PING_TIMEOUT):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.started_at = time.time()
+        self.shutting_down = False
+        self.pings = 0
+        self.cached = 0
+        self._result = None
+        self._checked_at = 0.0
+        self._in_flight = None
+
+    async def check(self):
+        """
+        The latest ping result, pinging again if it is older than `ttl`.
+        """
+        if self._result is not None and time.monotonic() - self._checked_at < self.ttl:
+            self.cached += 1
+            return self._result
+
+        if self._in_flight is None or self._in_flight.get_loop() is not asyncio.get_running_loop():
+            self._in_flight = asyncio.ensure_future(self._ping())
+        else:
+            self.cached += 1
+        # shielded so one cancelled probe doesn't cancel the ping the others wait for
+        return await asyncio.shield(self._in_flight)
+
+    async def _ping(self):
+        self.pings += 1
+        start = time.perf_counter()
+        try:
+            report = await asyncio.wait_for(get_client().ping(), self.timeout)
+        except asyncio.TimeoutError:
+            report = {"ok": False, "error": f"ping timed out after {self.timeout}s"}
+        except Exception as e:
+            logger.warning("Storage ping failed: %s", e)
+            report = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        finally:
+            self._in_flight = None
+
+        self._result = {
+            **report,
+            "ping_ms": round((time.perf_counter() - start) * 1000, 3),
+            "checked_at": time.time(),
+        }
+        self._checked_at = time.monotonic()
+        return self._result
+
+    def last(self):
+        return self._result
+
+    async def ready(self):
+        """
+        (ready, details); not ready while shutting down or when storage is unreachable.
+        """
+        if self.shutting_down:
+            return False, {"status": "shutting_down"}
+        storage = await self.check()
+        return storage["ok"], {"status": "ready" if storage["ok"] else "unavailable", "storage": storage}
+
+    def stats(self):
+        return {"pings": self.pings, "cached": self.cached, "ttl": self.ttl}
+
+
+storage_health = StorageHealth()
@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+
+from couchbase.exceptions import DocumentExistsException, DocumentNotFoundException
+from starlette.responses import JSONResponse
+
+from utils.cache import named_cache
+from utils.storage import get_client
+
+scope = os.getenv("COUCHBASE_SCOPE", "appdata")
+collection_name = "idempotency_keys"
+
+# How long a stored response is replayed, and how long a claim may stay in
+# progress before another worker is allowed to take the key over.
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_LOCK_TTL = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+# How long a retry waits for a request still running on another worker.
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+IDEMPOTENCY_CACHE_MAX = int(os.getenv("IDEMPOTENCY_CACHE_MAX_ENTRIES", "10000"))
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyConflict(Exception):
+    def __init__(self, status_code: int, detail: str):
+        self.status_code = status_code
+        self.detail = detail
+        super().__init__(detail)
+
+
+class IdempotencyStore:
+    """
+    Stored responses keyed by Idempotency-Key.
+
+    A key is claimed with an insert so only one worker runs the request;
+    its response is then written with a TTL and kept in an in-process cache.
+    Retries in the same process share the running request's result.
+    """
+
+    def __init__(self):
+        self.db = get_client().get_collection(scope, collection_name)
+        self._cache = named_cache("idempotency", ttl=IDEMPOTENCY_TTL, max_entries=IDEMPOTENCY_CACHE_MAX)
+        self._inflight = {}
+        self.executed = 0
+        self.replayed = 0
+        self.conflicts = 0
+
+    async def run(self, key: str, fingerprint: str, execute):
+        """
+        Return (response, replayed). `execute()` runs the request and returns a
+        response record {"status_code", "headers", "body"}; only 2xx records are
+        stored or shared with concurrent retries, which must send the same body.
+        """
+        while True:
+            record = self._cache.get(key)
+            if record is not None:
+                return self._replay(record, fingerprint), True
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+
+            owner_fingerprint, pending = inflight
+            self._check_fingerprint({"fingerprint": owner_fingerprint}, fingerprint)
+            try:
+                record = await asyncio.shield(pending)
+            except BaseException:
+                if not pending.done():
+                    raise  # this request was cancelled, not the one it waited for
+                continue  # the running request failed; try to run it ourselves
+            if 200 <= record["status_code"] < 300:
+                self.replayed += 1
+                return record, True
+            # failed requests changed nothing, so this one runs them again
+
+        pending = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (fingerprint, pending)
+        try:
+            record, replayed = await self._claim_and_execute(key, fingerprint, execute)
+            pending.set_result(record)
+            return record, replayed
+        except BaseException as e:
+            pending.set_exception(e)
+            pending.exception()  # retrieved: waiters may be gone
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _claim_and_execute(self, key, fingerprint, execute):
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT
+        while True:
+            try:
+                stored = await self.db.get(key)
+            except DocumentNotFoundException:
+                stored = None
+
+            if stored is None:
+                try:
+                    await self.db.insert(key, {"state": "in_progress", "fingerprint": fingerprint},
+                                         expiry=IDEMPOTENCY_LOCK_TTL)
+                    break
+                except DocumentExistsException:
+                    continue  # claimed concurrently, read it again
+
+            if stored["state"] == "completed":
+                self._cache.set(key, stored)
+                return self._replay(stored, fingerprint), True
+
+            self._check_fingerprint(stored, fingerprint)
+            if time.monotonic() >= deadline:
+                self.conflicts += 1
+                raise IdempotencyConflict(409, "A request with this Idempotency-Key is still in progress")
+            await asyncio.sleep(0.05)
+
+        try:
+            record = await execute()
+        except BaseException:
+            await self._release(key)
+            raise
+
+        self.executed += 1
+        if 200 <= record["status_code"] < 300:
+            stored = {"state": "completed", "fingerprint": fingerprint, **record}
+            await self.db.upsert(key, stored, expiry=IDEMPOTENCY_TTL)
+            self._cache.set(key, stored)
+        else:
+            # failed requests changed nothing, so a retry may run them again
+            await self._release(key)
+        return record, False
+
+    async def _release(self, key):
+        try:
+            await self.db.remove(key)
+        except DocumentNotFoundException:
+            pass
+
+    def _replay(self, record, fingerprint):
+        self._check_fingerprint(record, fingerprint)
+        self.replayed += 1
+        return record
+
+    def _check_fingerprint(self, record, fingerprint):
+        if record.get("fingerprint", fingerprint) != fingerprint:
+            self.conflicts += 1
+            raise IdempotencyConflict(422, "Idempotency-Key was already used with a different request")
+
+    def stats(self):
+        return {
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+            "in_flight": len(self._inflight),
+        }
+
+
+idempotency_store = IdempotencyStore()
+
+
+class IdempotencyMiddleware:
+    """
+    Makes POSTs to the given path patterns idempotent when the client sends
+    an Idempotency-Key header. Replayed responses carry Idempotent-Replayed: true.
+    """
+
+    def __init__(self, app, paths: list[str], store: IdempotencyStore = None):
+        self.app = app
+        self.paths = [re.compile(f"^{path}$") for path in paths]
+        self.store = store or idempotency_store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not any(
+            p.match(scope["path"]) for p in self.paths
+        ):
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(b"idempotency-key", b"").decode()
+        if not idempotency_key:
+            return await self.app(scope, receive, send)
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            response = JSONResponse({"detail": "Idempotency-Key is too long"}, status_code=400)
+            return await response(scope, receive, send)
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+
+        key = "idem::" + hashlib.sha256(f"{scope['path']}\n{idempotency_key}".encode()).hexdigest()
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        async def execute():
+            delivered = False
+
+            async def replay_receive():
+                nonlocal delivered
+                if not delivered:
+                    delivered = True
+                    return {"type": "http.request", "body": body, "more_body": False}
+                return await receive()
+
+            response = {"status_code": 500, "headers": [], "body": ""}
+            chunks = []
+
+            async def capture(message):
+                if message["type"] == "http.response.start":
+                    response["status_code"] = message["status"]
+                    response["headers"] = [
+                        [name.decode(), value.decode()] for name, value in message.get("headers", [])
+                        if name.lower() == b"content-type"
+                    ]
+                elif message["type"] == "http.response.body":
+                    chunks.append(message.get("body", b""))
+
+            await self.app(scope, replay_receive, capture)
+            response["body"] = b"".join(chunks).decode()
+            return response
+
+        try:
+            record, replayed = await self.store.run(key, fingerprint, execute)
+        except IdempotencyConflict as e:
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code)
+            return await response(scope, receive, send)
+
+        response_headers = [(name.encode(), value.encode()) for name, value in record["headers"]]
+        if replayed:
+            response_headers.append((b"idempotent-replayed", b"true"))
+        body = record["body"].encode()
+        response_headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": record["status_code"], "headers": response_headers})
+        await send({"type": "http.response.body", "body": body})
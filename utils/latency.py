@@ -0,0 +1,19 @@
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+
+def summarize(samples):
+    """
+    Latency samples in seconds -> {"count", "p50", "p95", "p99", "max"} in milliseconds.
+    """
+    if not samples:
+        return {"count": 0, **{f"p{p}": None for p in PERCENTILES}, "max": None}
+
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    values = np.percentile(ms, PERCENTILES)
+    return {
+        "count": len(ms),
+        **{f"p{p}": round(float(v), 3) for p, v in zip(PERCENTILES, values)},
+        "max": round(float(ms.max()), 3),
+    }
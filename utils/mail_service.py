@@ -1,29 +1,211 @@
+import asyncio
 import smtplib
 import os
+import time
+from dataclasses import dataclass
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+from utils.metrics import MAIL_SEND_ERRORS, MAIL_SEND_SECONDS
+from utils.tracing import traced
+
 EMAIL = os.getenv("EMAIL")
-PASSWORD = os.getenv("PASSWORD")
 
 
 class MailService:
     @staticmethod
-    def send_email(to_email: str, subject: str, body: str):
+    def build_message(to_email: str, subject: str, body: str, sender: str = None):
+        msg = MIMEMultipart()
+        msg["From"] = sender or EMAIL or "no-reply@localhost"
+        msg["To"] = to_email
+        msg["Subject"] = subject
+
+        msg.attach(MIMEText(body, "plain"))
+        return msg
+
+
+@dataclass
+class OutboxMessage:
+    to_email: str
+    subject: str
+    body: str
+    attempts: int = 0
+
+
+class MailOutbox:
+    """
+    Background email queue.
+    Handlers enqueue and return immediately; one worker keeps an authenticated
+    SMTP connection open, sends in batches and retries failures with backoff.
+
+    SMTP settings come from the environment when the connection is opened:
+    SMTP_HOST, SMTP_PORT, SMTP_STARTTLS, EMAIL and PASSWORD. Point SMTP_HOST/
+    SMTP_PORT at a local stand-in (e.g. aiosmtpd) with SMTP_STARTTLS=false for tests.
+    """
+
+    def __init__(self):
+        self.max_size = int(os.getenv("MAIL_QUEUE_MAX", "1000"))
+        self.batch_size = int(os.getenv("MAIL_BATCH_SIZE", "20"))
+        self.max_retries = int(os.getenv("MAIL_MAX_RETRIES", "5"))
+        self.backoff = float(os.getenv("MAIL_RETRY_BACKOFF", "1"))
+
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self._server = None
+        self._retry_handles = set()
+
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    # ---------------------
+    # Producer side
+    # ---------------------
+
+    def enqueue(self, to_email: str, subject: str, body: str):
+        self.start()
+        message = OutboxMessage(to_email, subject, body)
         try:
-            msg = MIMEMultipart()
-            msg["From"] = EMAIL
-            msg["To"] = to_email
-            msg["Subject"] = subject
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.failed += 1
+            return {"status": "error", "message": "Mail queue is full"}
+        return {"status": "queued", "message": f"Email to {to_email} queued"}
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "retrying": len(self._retry_handles),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "connected": self._server is not None,
+        }
 
-            msg.attach(MIMEText(body, "plain"))
+    # ---------------------
+    # Lifecycle
+    # ---------------------
 
-            with smtplib.SMTP("smtp.gmail.com", 587) as server:
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is not None and not self._worker.done() and self._loop is loop:
+            return
+
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._retry_handles.clear()
+        self._worker = loop.create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0):
+        """
+        Give queued mail a chance to go out, then stop the worker and close the connection.
+        """
+        if self._worker is None:
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        for handle in self._retry_handles:
+            handle.cancel()
+        self._retry_handles.clear()
+
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        await asyncio.to_thread(self._disconnect)
+
+    # ---------------------
+    # Worker
+    # ---------------------
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                failed = await asyncio.to_thread(self._send_batch, batch)
+            except Exception:
+                failed = batch
+
+            self.sent += len(batch) - len(failed)
+            for message in failed:
+                self._schedule_retry(message)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _schedule_retry(self, message: OutboxMessage):
+        message.attempts += 1
+        if message.attempts > self.max_retries:
+            self.failed += 1
+            return
+
+        self.retried += 1
+        delay = self.backoff * (2 ** (message.attempts - 1))
+
+        def requeue():
+            self._retry_handles.discard(handle)
+            try:
+                self._queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.failed += 1
+
+        handle = self._loop.call_later(delay, requeue)
+        self._retry_handles.add(handle)
+
+    # Runs on a worker thread: smtplib is blocking.
+    @traced("MailOutbox.send_batch")
+    def _send_batch(self, batch: list[OutboxMessage]):
+        failed = []
+        for message in batch:
+            msg = MailService.build_message(message.to_email, message.subject, message.body, os.getenv("EMAIL"))
+            start = time.perf_counter()
+            try:
+                try:
+                    self._connection().send_message(msg)
+                except smtplib.SMTPServerDisconnected:
+                    # Idle connection was dropped by the server, reconnect once
+                    self._disconnect()
+                    self._connection().send_message(msg)
+            except (smtplib.SMTPException, OSError):
+                self._disconnect()
+                MAIL_SEND_ERRORS.inc()
+                failed.append(message)
+            finally:
+                MAIL_SEND_SECONDS.observe(time.perf_counter() - start)
+        return failed
+
+    def _connection(self):
+        if self._server is None:
+            host = os.getenv("SMTP_HOST", "smtp.gmail.com")
+            port = int(os.getenv("SMTP_PORT", "587"))
+            starttls = os.getenv("SMTP_STARTTLS", "true").lower() not in ("0", "false", "no")
+            email, password = os.getenv("EMAIL"), os.getenv("PASSWORD")
+
+            server = smtplib.SMTP(host, port, timeout=30)
+            if starttls:
                 server.starttls()
-                server.login(EMAIL, PASSWORD)
-                server.send_message(msg)
+            if email and password:
+                server.login(email, password)
+            self._server = server
+        return self._server
+
+    def _disconnect(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
 
-            return {"status": "success", "message": f"Email sent to {to_email}"}
 
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
+mail_outbox = MailOutbox()
@@ -0,0 +1,283 @@
+import json
+import operator
+import os
+import re
+import time
+
+from couchbase.exceptions import CasMismatchException, DocumentExistsException, DocumentNotFoundException
+
+from utils.subdoc import apply_ops
+from utils.metrics import InstrumentedCollection
+
+# Only the N1QL shapes used by the routes are supported:
+#   SELECT [META().id,] x.* | x.f1[, x.f2 ...] FROM `bucket`.`scope`.`collection` x
+#     [WHERE <cond> [AND <cond> ...]] [ORDER BY x.f [ASC|DESC], ...] [LIMIT $n]
+# where <cond> is one of
+#   x.field <op> $n | x.field IS NOT MISSING | ARRAY_CONTAINS(x.field, $n)
+#   | (<cond> OR <cond> ...)
+_SELECT_RE = re.compile(
+    r"^\s*SELECT\s+(?P<fields>.+?)\s+FROM\s+"
+    r"`(?P<bucket>[^`]+)`\.`(?P<scope>[^`]+)`\.`(?P<collection>[^`]+)`\s+(?P<alias>\w+)"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"(?:\s+ORDER\s+BY\s+(?P<order>.+?))?"
+    r"(?:\s+LIMIT\s+(?P<limit>\$?\d+))?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+_FIELD = r"(?P<alias>\w+)\.(?P<field>\w+)"
+_OP = r"(?P<op>=|!=|<=|>=|<|>)"
+_COMPARE_RE = re.compile(rf"^{_FIELD}\s*{_OP}\s*\$(?P<param>\d+)$")
+_CONTAINS_RE = re.compile(rf"^ARRAY_CONTAINS\(\s*{_FIELD}\s*,\s*\$(?P<param>\d+)\s*\)$", re.IGNORECASE)
+_MISSING_RE = re.compile(rf"^{_FIELD}\s+IS\s+NOT\s+MISSING$", re.IGNORECASE)
+_ANY_OF_RE = re.compile(r"^\((?P<clauses>.+)\)$", re.DOTALL)
+_ORDER_RE = re.compile(rf"^{_FIELD}(?:\s+(?P<direction>ASC|DESC))?$", re.IGNORECASE)
+
+_OPERATORS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+class _Descending:
+    """
+    Sort key wrapper that inverts ordering.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def _copy(value):
+    # Round-trip through JSON so callers never share state with the store,
+    # just like documents coming back from the cluster.
+    return json.loads(json.dumps(value))
+
+
+class MemoryCollection:
+    """
+    Dict-backed stand-in for AsyncCollection.
+    """
+
+    def __init__(self, client, scope_name, collection_name):
+        self._client = client
+        self.scope_name = scope_name
+        self.collection_name = collection_name
+        self._docs = client.documents(scope_name, collection_name)
+        self._cas = client.cas_values(scope_name, collection_name)
+        self._expiry = client.expiry_values(scope_name, collection_name)
+
+    @property
+    def keyspace(self):
+        return f"`{self._client.bucket_name}`.`{self.scope_name}`.`{self.collection_name}`"
+
+    def _exists(self, key):
+        expires_at = self._expiry.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            # expired documents disappear on their next access
+            self._docs.pop(key, None)
+            self._cas.pop(key, None)
+            del self._expiry[key]
+        return key in self._docs
+
+    async def get(self, key):
+        if not self._exists(key):
+            raise DocumentNotFoundException(message=f"document not found: {key}")
+        return _copy(self._docs[key])
+
+    async def get_multi(self, keys):
+        return {key: _copy(self._docs[key]) for key in keys if self._exists(key)}
+
+    async def upsert(self, key, value, expiry=None):
+        self._docs[key] = _copy(value)
+        self._touch(key, expiry)
+
+    async def insert(self, key, value, expiry=None):
+        if self._exists(key):
+            raise DocumentExistsException(message=f"document exists: {key}")
+        await self.upsert(key, value, expiry)
+
+    async def remove(self, key):
+        if not self._exists(key):
+            raise DocumentNotFoundException(message=f"document not found: {key}")
+        del self._docs[key]
+        self._cas.pop(key, None)
+        self._expiry.pop(key, None)
+
+    async def upsert_multi(self, docs):
+        errors = {}
+        for key, value in docs.items():
+            try:
+                self._docs[key] = _copy(value)
+                self._touch(key)
+            except (TypeError, ValueError) as e:
+                errors[key] = e
+        return errors
+
+    async def get_with_cas(self, key):
+        doc = await self.get(key)
+        return doc, self._cas.get(key, 0)
+
+    async def mutate_in(self, key, ops, cas=None):
+        if not self._exists(key):
+            raise DocumentNotFoundException(message=f"document not found: {key}")
+        if cas is not None and cas != self._cas.get(key, 0):
+            raise CasMismatchException(message=f"CAS mismatch on {key}")
+
+        self._docs[key] = apply_ops(self._docs[key], ops)
+        self._touch(key)
+
+    def _touch(self, key, expiry=None):
+        self._cas[key] = self._client.next_cas()
+        if expiry is None:
+            self._expiry.pop(key, None)
+        else:
+            self._expiry[key] = time.time() + expiry
+
+    async def query(self, statement, *params, prepared=False):
+        return self._client.execute(statement, params)
+
+    async def query_iter(self, statement, *params, prepared=False):
+        for row in self._client.execute(statement, params):
+            yield row
+
+
+class MemoryClient:
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(MemoryClient, cls).__new__(cls)
+            cls._instance.bucket_name = os.getenv("COUCHBASE_BUCKET", "b0")
+            cls._instance._store = {}
+            cls._instance._cas_values = {}
+            cls._instance._expiry_values = {}
+            cls._instance._last_cas = 0
+        return cls._instance
+
+    async def connect(self):
+        return None
+
+    async def close(self):
+        pass
+
+    async def ping(self):
+        return {"ok": True, "backend": "memory", "services": {}}
+
+    def documents(self, scope_name, collection_name):
+        return self._store.setdefault((scope_name, collection_name), {})
+
+    def cas_values(self, scope_name, collection_name):
+        return self._cas_values.setdefault((scope_name, collection_name), {})
+
+    def expiry_values(self, scope_name, collection_name):
+        return self._expiry_values.setdefault((scope_name, collection_name), {})
+
+    def next_cas(self):
+        self._last_cas += 1
+        return self._last_cas
+
+    def get_collection(self, scope_name, collection_name):
+        return InstrumentedCollection(MemoryCollection(self, scope_name, collection_name))
+
+    def reset(self):
+        for docs in self._store.values():
+            docs.clear()
+        for cas in self._cas_values.values():
+            cas.clear()
+        for expiry in self._expiry_values.values():
+            expiry.clear()
+
+    def execute(self, statement, params):
+        match = _SELECT_RE.match(statement)
+        if not match:
+            raise ValueError(f"Unsupported query for memory backend: {statement}")
+
+        alias = match.group("alias")
+        fields = [f.strip() for f in match.group("fields").split(",")]
+        conditions = []
+        if match.group("where"):
+            for clause in re.split(r"\s+AND\s+", match.group("where").strip(), flags=re.IGNORECASE):
+                conditions.append(self._condition(clause.strip(), alias, params))
+
+        docs = self.documents(match.group("scope"), match.group("collection"))
+        matched = [(key, doc) for key, doc in docs.items() if all(cond(doc) for cond in conditions)]
+
+        if match.group("order"):
+            matched = self._order(matched, match.group("order"), alias)
+
+        if match.group("limit"):
+            limit = match.group("limit")
+            matched = matched[:int(params[int(limit[1:]) - 1] if limit.startswith("$") else limit)]
+
+        rows = []
+        for key, doc in matched:
+            row = {}
+            for field in fields:
+                if field.upper() == "META().ID":
+                    row["id"] = key
+                elif field == f"{alias}.*":
+                    row.update(_copy(doc))
+                elif field.startswith(f"{alias}.") and field[len(alias) + 1:].isidentifier():
+                    # like N1QL, a missing field is left out of the row
+                    name = field[len(alias) + 1:]
+                    if name in doc:
+                        row[name] = _copy(doc[name])
+                else:
+                    raise ValueError(f"Unsupported projection for memory backend: {field}")
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def _condition(clause, alias, params):
+        def param(ref):
+            return params[int(ref.strip().lstrip("$")) - 1]
+
+        compare = _COMPARE_RE.match(clause)
+        if compare and compare.group("alias") == alias:
+            field, op, value = compare.group("field"), _OPERATORS[compare.group("op")], param(compare.group("param"))
+            # like N1QL, a missing field never satisfies a comparison
+            return lambda doc: doc.get(field) is not None and op(doc.get(field), value)
+
+        contains = _CONTAINS_RE.match(clause)
+        if contains and contains.group("alias") == alias:
+            field, value = contains.group("field"), param(contains.group("param"))
+            return lambda doc: isinstance(doc.get(field), list) and value in doc[field]
+
+        missing = _MISSING_RE.match(clause)
+        if missing and missing.group("alias") == alias:
+            field = missing.group("field")
+            return lambda doc: field in doc
+
+        any_of = _ANY_OF_RE.match(clause)
+        if any_of:
+            options = [
+                MemoryClient._condition(part.strip(), alias, params)
+                for part in re.split(r"\s+OR\s+", any_of.group("clauses").strip(), flags=re.IGNORECASE)
+            ]
+            return lambda doc: any(option(doc) for option in options)
+
+        raise ValueError(f"Unsupported WHERE clause for memory backend: {clause}")
+
+    @staticmethod
+    def _order(matched, order, alias):
+        terms = []
+        for term in order.split(","):
+            term_match = _ORDER_RE.match(term.strip())
+            if not term_match or term_match.group("alias") != alias:
+                raise ValueError(f"Unsupported ORDER BY for memory backend: {term}")
+            terms.append((term_match.group("field"), (term_match.group("direction") or "ASC").upper() == "DESC"))
+
+        def sort_key(item):
+            doc = item[1]
+            return tuple(_Descending(doc.get(f)) if desc else doc.get(f) for f, desc in terms)
+
+        return sorted(matched, key=sort_key)
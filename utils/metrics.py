@@ -0,0 +1,164 @@
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client import multiprocess
+
+from utils.tracing import tracer
+
+# Seconds; covers cached KV reads (sub-ms) up to slow bcrypt and SMTP calls.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP responses by route template and status code",
+    ["method", "route", "status"],
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled",
+    ["method"], multiprocess_mode="livesum",
+)
+
+DB_OP_SECONDS = Histogram(
+    "db_operation_duration_seconds", "Storage operation latency by collection and operation",
+    ["collection", "op"], buckets=LATENCY_BUCKETS,
+)
+DB_OP_ERRORS = Counter(
+    "db_operation_errors_total", "Storage operations that raised, by exception type",
+    ["collection", "op", "error"],
+)
+
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_duration_seconds", "bcrypt work in the hashing pool, including queueing",
+    ["op"], buckets=LATENCY_BUCKETS,
+)
+MAIL_SEND_SECONDS = Histogram(
+    "mail_send_duration_seconds", "SMTP delivery of one message", buckets=LATENCY_BUCKETS,
+)
+MAIL_SEND_ERRORS = Counter("mail_send_errors_total", "SMTP deliveries that failed")
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status code and in-flight count for every HTTP request.
+    Requests are labelled with the matched route template, not the raw path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.labels(method).inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.labels(method).dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(method, route).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+
+
+class InstrumentedCollection:
+    """
+    Times every storage operation of a collection and counts its failures.
+    Wraps the collections of every storage backend.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+        self._name = collection.collection_name
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def _span(self, op):
+        return tracer.start_as_current_span(f"db.{op}", attributes={
+            "db.system": "couchbase",
+            "db.collection": self._name,
+            "db.operation": op,
+        })
+
+    async def _timed(self, op, coro):
+        start = time.perf_counter()
+        try:
+            with self._span(op):
+                return await coro
+        except Exception as e:
+            DB_OP_ERRORS.labels(self._name, op, type(e).__name__).inc()
+            raise
+        finally:
+            DB_OP_SECONDS.labels(self._name, op).observe(time.perf_counter() - start)
+
+    async def get(self, key):
+        return await self._timed("get", self._collection.get(key))
+
+    async def get_multi(self, keys):
+        return await self._timed("get_multi", self._collection.get_multi(keys))
+
+    async def get_with_cas(self, key):
+        return await self._timed("get", self._collection.get_with_cas(key))
+
+    async def upsert(self, key, value, expiry=None):
+        return await self._timed("upsert", self._collection.upsert(key, value, expiry=expiry))
+
+    async def upsert_multi(self, docs):
+        return await self._timed("upsert_multi", self._collection.upsert_multi(docs))
+
+    async def insert(self, key, value, expiry=None):
+        return await self._timed("insert", self._collection.insert(key, value, expiry=expiry))
+
+    async def remove(self, key):
+        return await self._timed("remove", self._collection.remove(key))
+
+    async def mutate_in(self, key, ops, cas=None):
+        return await self._timed("mutate_in", self._collection.mutate_in(key, ops, cas=cas))
+
+    async def query(self, statement, *params, prepared=False):
+        return await self._timed("query", self._collection.query(statement, *params, prepared=prepared))
+
+    async def query_iter(self, statement, *params, prepared=False):
+        # timed until the stream is exhausted or abandoned
+        start = time.perf_counter()
+        try:
+            # the span only covers fetching each row, never the caller's work between rows
+            rows = self._collection.query_iter(statement, *params, prepared=prepared)
+            while True:
+                with self._span("query_iter"):
+                    try:
+                        row = await anext(rows)
+                    except StopAsyncIteration:
+                        break
+                yield row
+        except Exception as e:
+            DB_OP_ERRORS.labels(self._name, "query", type(e).__name__).inc()
+            raise
+        finally:
+            DB_OP_SECONDS.labels(self._name, "query").observe(time.perf_counter() - start)
+
+
+def render_metrics():
+    """
+    Current metrics in the Prometheus text format, aggregated across worker
+    processes when PROMETHEUS_MULTIPROC_DIR is set.
+    """
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import random
+from collections import Counter
+
+from couchbase.exceptions import CasMismatchException
+
+from utils.subdoc import apply_ops
+
+MAX_ATTEMPTS = int(os.getenv("CAS_MAX_ATTEMPTS", "8"))
+BASE_DELAY = float(os.getenv("CAS_RETRY_BASE_DELAY", "0.005"))
+MAX_DELAY = float(os.getenv("CAS_RETRY_MAX_DELAY", "0.2"))
+HOT_KEYS_TRACKED = 1000
+
+
+class ContentionError(Exception):
+    """
+    Raised when a document kept changing underneath us for every attempt.
+    """
+
+
+class ContentionStats:
+    def __init__(self):
+        self.updates = 0
+        self.conflicts = 0
+        self.exhausted = 0
+        self.hot_keys = Counter()
+
+    def record_conflict(self, keyspace: str, key: str):
+        self.conflicts += 1
+        self.hot_keys[f"{keyspace}:{key}"] += 1
+        # keep the counter bounded; the hottest keys survive
+        if len(self.hot_keys) > HOT_KEYS_TRACKED * 2:
+            self.hot_keys = Counter(dict(self.hot_keys.most_common(HOT_KEYS_TRACKED)))
+
+    def snapshot(self, top: int = 20):
+        return {
+            "updates": self.updates,
+            "conflicts": self.conflicts,
+            "exhausted": self.exhausted,
+            "hot_keys": dict(self.hot_keys.most_common(top)),
+        }
+
+
+contention_stats = ContentionStats()
+
+
+async def optimistic_update(db, key: str, mutate, max_attempts: int = MAX_ATTEMPTS):
+    """
+    Read `key` with its CAS, let `mutate(doc)` decide what to change, and write
+    the change only if nobody else wrote the document in between.
+
+    `mutate` returns a list of sub-document ops (see AsyncCollection.mutate_in);
+    an empty list means nothing to do. It may raise to abort the update.
+    On CAS mismatch the read is retried after a jittered exponential backoff.
+    Returns the document as written.
+    """
+    for attempt in range(max_attempts):
+        doc, cas = await db.get_with_cas(key)
+        ops = mutate(doc)
+        if not ops:
+            return doc
+
+        try:
+            await db.mutate_in(key, ops, cas=cas)
+        except CasMismatchException:
+            contention_stats.record_conflict(db.keyspace, key)
+            await asyncio.sleep(random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt)))
+            continue
+
+        contention_stats.updates += 1
+        return apply_ops(doc, ops)
+
+    contention_stats.exhausted += 1
+    raise ContentionError(f"Gave up updating {key} after {max_attempts} conflicting attempts")
@@ -0,0 +1,105 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+
+from utils.metrics import PASSWORD_HASH_SECONDS
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+# Hashes made with a different cost factor are flagged by verify_and_update,
+# so changing BCRYPT_ROUNDS rehashes users as they log in.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+# These run inside the pool's worker processes.
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify_and_update(password: str, hashed: str):
+    return pwd_context.verify_and_update(password, hashed)
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when the hashing pool already has max_pending jobs.
+    """
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a dedicated process pool so it never holds the event loop or the GIL.
+    At most `max_pending` jobs may be queued or running; beyond that calls fail fast.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    def start(self):
+        if self._executor is None:
+            # spawn: never fork a process that holds SDK or event-loop threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy("Password hashing pool is saturated")
+
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.start(), fn, *args)
+            self.completed += 1
+            return result
+        finally:
+            self.pending -= 1
+            PASSWORD_HASH_SECONDS.labels(fn.__name__.lstrip("_")).observe(time.perf_counter() - start)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str):
+        """
+        Returns (valid, new_hash). new_hash is set when the stored hash
+        uses an outdated cost factor and should be replaced.
+        """
+        valid, new_hash = await self._run(_verify_and_update, password, hashed)
+        if new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "busy_workers": min(self.pending, self.workers),
+            "queued": max(0, self.pending - self.workers),
+            "saturation": self.pending / self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,90 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    name: str
+    collection: str
+    keys: tuple
+
+    def create_statement(self, keyspace: str) -> str:
+        return f"CREATE INDEX IF NOT EXISTS `{self.name}` ON {keyspace}({', '.join(self.keys)})"
+
+
+@dataclass(frozen=True)
+class NamedQuery:
+    """
+    A N1QL statement plus the index it relies on.
+    `statement` uses {keyspace} for the collection it reads.
+    """
+    name: str
+    collection: str
+    statement: str
+    index: IndexSpec
+
+    def render(self, keyspace: str) -> str:
+        return self.statement.format(keyspace=keyspace)
+
+
+INDEXES = {
+    index.name: index
+    for index in (
+        IndexSpec("idx_bills_session_id", "bills", ("session_id",)),
+        IndexSpec("idx_payments_session_id", "payments", ("session_id",)),
+        IndexSpec("idx_splits_bill_id", "splits", ("bill_id",)),
+        IndexSpec("idx_users_email", "users", ("email",)),
+        # serves GET /sessions/: the query always constrains created_at (IS NOT MISSING,
+        # plus the cursor in range form) so the planner scans this index in ORDER BY order;
+        # status/vendor filters are evaluated on the index keys
+        IndexSpec("idx_sessions_created_at", "bill_sessions", ("created_at DESC", "session_id DESC", "status", "vendor_id")),
+    )
+}
+
+QUERIES = {
+    query.name: query
+    for query in (
+        NamedQuery(
+            "bills_by_session", "bills",
+            "SELECT b.* FROM {keyspace} b WHERE b.session_id = $1",
+            INDEXES["idx_bills_session_id"],
+        ),
+        NamedQuery(
+            "payments_by_session", "payments",
+            "SELECT p.* FROM {keyspace} p WHERE p.session_id = $1",
+            INDEXES["idx_payments_session_id"],
+        ),
+        NamedQuery(
+            "splits_by_bill", "splits",
+            "SELECT s.* FROM {keyspace} s WHERE s.bill_id = $1",
+            INDEXES["idx_splits_bill_id"],
+        ),
+        # one-off backfill of email lookup docs; no request path queries users
+        NamedQuery(
+            "users_with_email", "users",
+            "SELECT META().id, u.email FROM {keyspace} u WHERE u.email IS NOT MISSING",
+            INDEXES["idx_users_email"],
+        ),
+    )
+}
+
+
+async def run_query(db, name: str, *params):
+    """
+    Execute a registered query as a prepared statement against `db`.
+    """
+    query = QUERIES[name]
+    if db.collection_name != query.collection:
+        raise ValueError(f"Query {name} reads {query.collection}, not {db.collection_name}")
+    return await db.query(query.render(db.keyspace), *params, prepared=True)
+
+
+async def ensure_indexes(client, scope: str):
+    """
+    Create every index the registered queries need. Safe to run repeatedly.
+    """
+    created = []
+    for index in INDEXES.values():
+        db = client.get_collection(scope, index.collection)
+        await db.query(index.create_statement(db.keyspace))
+        created.append(index.name)
+    return created
@@ -0,0 +1,152 @@
+import importlib
+import math
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+
+from fastapi import HTTPException, Request
+
+# "memory" or a "package.module:ClassName" implementing RateLimitStore
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() not in ("0", "false", "no")
+RATE_LIMIT_MAX_BUCKETS = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "100000"))
+# Use the first X-Forwarded-For address as the client IP (only behind a trusted proxy)
+TRUST_FORWARDED_FOR = os.getenv("RATE_LIMIT_TRUST_FORWARDED_FOR", "false").lower() in ("1", "true", "yes")
+
+_PERIODS = {"s": 1, "second": 1, "m": 60, "minute": 60, "h": 3600, "hour": 3600, "d": 86400, "day": 86400}
+_BUDGET_RE = re.compile(r"^\s*(?P<count>\d+)\s*/\s*(?P<n>\d+)?\s*(?P<unit>[a-z]+)\s*$")
+
+
+def parse_budget(spec: str):
+    """
+    "5/minute", "20/15m", "100/hour" -> (burst, tokens refilled per second).
+    """
+    match = _BUDGET_RE.match(spec.lower())
+    if not match or match.group("unit") not in _PERIODS:
+        raise ValueError(f"Invalid rate limit {spec!r}, expected e.g. '5/minute'")
+    count = int(match.group("count"))
+    period = int(match.group("n") or 1) * _PERIODS[match.group("unit")]
+    return count, count / period
+
+
+class RateLimitStore(ABC):
+    """
+    Token buckets shared by every RateLimit. The default lives in this
+    process; multi-worker deployments plug in one backed by a shared store
+    so all workers draw from the same buckets.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, burst: int, rate: float) -> float:
+        """
+        Take one token from `key`'s bucket (capacity `burst`, refilled at
+        `rate` tokens per second). Returns 0 when allowed, otherwise the
+        seconds until a token will be available.
+        """
+
+    def stats(self):
+        return {}
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    def __init__(self, max_buckets: int = RATE_LIMIT_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, burst: int, rate: float) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+
+        # least recently used buckets are dropped first; a dropped bucket is simply full again
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        self._buckets.clear()
+
+    def stats(self):
+        return {"buckets": len(self._buckets)}
+
+
+def load_store(spec: str = RATE_LIMIT_STORE) -> RateLimitStore:
+    if spec == "memory":
+        return InMemoryRateLimitStore()
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+rate_limit_store = load_store()
+rejections = Counter()
+
+
+def client_ip(request: Request) -> str:
+    if TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class RateLimit:
+    """
+    FastAPI dependency enforcing a per-IP and a per-email token bucket for one route.
+
+    Budgets look like "5/minute" and can be overridden with
+    RATE_LIMIT_<NAME>_PER_IP / RATE_LIMIT_<NAME>_PER_EMAIL. The email is read
+    from the JSON body's "email" field.
+    """
+
+    def __init__(self, name: str, per_ip: str = None, per_email: str = None, store: RateLimitStore = None):
+        self.name = name
+        env_name = name.upper().replace("-", "_")
+        per_ip = os.getenv(f"RATE_LIMIT_{env_name}_PER_IP", per_ip)
+        per_email = os.getenv(f"RATE_LIMIT_{env_name}_PER_EMAIL", per_email)
+        self.per_ip = parse_budget(per_ip) if per_ip else None
+        self.per_email = parse_budget(per_email) if per_email else None
+        self._store = store
+
+    @property
+    def store(self):
+        return self._store or rate_limit_store
+
+    async def __call__(self, request: Request):
+        if not RATE_LIMIT_ENABLED:
+            return
+
+        if self.per_ip:
+            await self._take("ip", client_ip(request), self.per_ip)
+
+        if self.per_email:
+            try:
+                body = await request.json()
+            except ValueError:
+                body = None
+            email = body.get("email") if isinstance(body, dict) else None
+            if isinstance(email, str) and email:
+                await self._take("email", email.strip().lower(), self.per_email)
+
+    async def _take(self, kind: str, subject: str, budget):
+        burst, rate = budget
+        wait = await self.store.take(f"{self.name}:{kind}:{subject}", burst, rate)
+        if wait > 0:
+            rejections[f"{self.name}:{kind}"] += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, slow down",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+
+def rate_limit_stats():
+    return {"rejections": dict(rejections), **rate_limit_store.stats()}
@@ -0,0 +1,22 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def get_client():
+    """
+    Returns the storage client selected by STORAGE_BACKEND.
+    "couchbase" (default) talks to the cluster, "memory" keeps everything in-process.
+    """
+    backend = os.getenv("STORAGE_BACKEND", "couchbase").lower()
+
+    if backend == "memory":
+        from utils.memory_client import MemoryClient
+        return MemoryClient()
+
+    if backend == "couchbase":
+        from utils.couchbase_client import AsyncCouchbaseClient
+        return AsyncCouchbaseClient()
+
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
@@ -0,0 +1,39 @@
+import copy
+
+from couchbase.exceptions import PathExistsException, PathNotFoundException
+
+
+def apply_ops(doc: dict, ops: list) -> dict:
+    """
+    Apply (op, path, *values) sub-document ops to a copy of `doc`, with the
+    same semantics as the server. Returns the updated copy.
+    """
+    doc = copy.deepcopy(doc)
+    for op, path, *values in ops:
+        *parents, leaf = path.split(".")
+        target = doc
+        for part in parents:
+            if not isinstance(target.get(part), dict):
+                raise PathNotFoundException(message=f"path not found: {path}")
+            target = target[part]
+
+        if op == "upsert":
+            target[leaf] = copy.deepcopy(values[0])
+        elif op == "replace":
+            if leaf not in target:
+                raise PathNotFoundException(message=f"path not found: {path}")
+            target[leaf] = copy.deepcopy(values[0])
+        elif op == "remove":
+            if leaf not in target:
+                raise PathNotFoundException(message=f"path not found: {path}")
+            del target[leaf]
+        elif op == "array_addunique":
+            if not isinstance(target.get(leaf), list):
+                raise PathNotFoundException(message=f"path not found: {path}")
+            for value in values:
+                if value in target[leaf]:
+                    raise PathExistsException(message=f"value already in {path}")
+                target[leaf].append(copy.deepcopy(value))
+        else:
+            raise ValueError(f"Unsupported sub-document op: {op}")
+    return doc
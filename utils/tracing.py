@@ -0,0 +1,321 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# "none" (default), "memory" or "file"
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_MEMORY_MAX_SPANS = int(os.getenv("TRACING_MEMORY_MAX_SPANS", "10000"))
+
+_current_span = ContextVar("current_span", default=None)
+request_id_var = ContextVar("request_id", default=None)
+
+_TRACEPARENT_RE = re.compile(r"^00-(?P<trace_id>[0-9a-f]{32})-(?P<span_id>[0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+class StatusCode:
+    UNSET = "UNSET"
+    OK = "OK"
+    ERROR = "ERROR"
+
+
+class Span:
+    """
+    A timed operation. Method names follow opentelemetry.trace.Span.
+    """
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.status = StatusCode.UNSET
+        self.status_description = None
+        self.start_time = time.time_ns()
+        self.end_time = None
+
+    def is_recording(self):
+        return self.end_time is None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes):
+        self.attributes.update(attributes)
+
+    def add_event(self, name, attributes=None):
+        self.events.append({"name": name, "time": time.time_ns(), "attributes": dict(attributes or {})})
+
+    def record_exception(self, exception):
+        self.add_event("exception", {
+            "exception.type": type(exception).__name__,
+            "exception.message": str(exception),
+        })
+
+    def set_status(self, status, description=None):
+        self.status = status
+        self.status_description = description
+
+    def update_name(self, name):
+        self.name = name
+
+    def end(self):
+        if self.end_time is None:
+            self.end_time = time.time_ns()
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": (self.end_time - self.start_time) / 1e6 if self.end_time else None,
+            "status": self.status,
+            "status_description": self.status_description,
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+
+class NonRecordingSpan:
+    """
+    What the tracer hands out while tracing is off; every call is a no-op.
+    """
+
+    trace_id = None
+    span_id = None
+
+    def is_recording(self):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def add_event(self, name, attributes=None):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+    def set_status(self, status, description=None):
+        pass
+
+    def update_name(self, name):
+        pass
+
+    def end(self):
+        pass
+
+
+_NON_RECORDING = NonRecordingSpan()
+
+
+class InMemorySpanExporter:
+    def __init__(self, max_spans: int = TRACING_MEMORY_MAX_SPANS):
+        self._spans = deque(maxlen=max_spans)
+
+    def export(self, span: Span):
+        self._spans.append(span.to_dict())
+
+    def get_finished_spans(self):
+        return list(self._spans)
+
+    def clear(self):
+        self._spans.clear()
+
+
+class FileSpanExporter:
+    """
+    Appends one JSON object per finished span to `path`.
+    """
+
+    def __init__(self, path: str = TRACING_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock, open(self.path, "a") as f:
+            f.write(line)
+
+
+def load_exporter(kind: str = TRACING_EXPORTER):
+    if kind in ("", "none"):
+        return None
+    if kind == "memory":
+        return InMemorySpanExporter()
+    if kind == "file":
+        return FileSpanExporter()
+    raise ValueError(f"Unknown TRACING_EXPORTER: {kind}")
+
+
+class Tracer:
+    """
+    Minimal tracer with the opentelemetry.trace.Tracer call shape.
+    Without an exporter it never records anything.
+    """
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+
+    def use_exporter(self, exporter):
+        self.exporter = exporter
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None, record_exception=True, set_status_on_exception=True):
+        if self.exporter is None:
+            yield _NON_RECORDING
+            return
+
+        parent = _current_span.get()
+        span = Span(name, parent.trace_id if parent else secrets.token_hex(16), parent and parent.span_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            if record_exception:
+                span.record_exception(e)
+            if set_status_on_exception:
+                span.set_status(StatusCode.ERROR, str(e))
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+            self.exporter.export(span)
+
+    @contextmanager
+    def start_root_span(self, name, traceparent: str = None, attributes=None):
+        """
+        Start a request's span, continuing the caller's trace when a W3C
+        traceparent header is given.
+        """
+        match = _TRACEPARENT_RE.match(traceparent or "")
+        if self.exporter is None or not match:
+            with self.start_as_current_span(name, attributes) as span:
+                yield span
+            return
+
+        remote = Span("remote", match.group("trace_id"))
+        remote.span_id = match.group("span_id")
+        token = _current_span.set(remote)
+        try:
+            with self.start_as_current_span(name, attributes) as span:
+                yield span
+        finally:
+            _current_span.reset(token)
+
+
+tracer = Tracer(load_exporter())
+
+
+def get_tracer(name: str = None) -> Tracer:
+    return tracer
+
+
+def get_current_span():
+    return _current_span.get() or _NON_RECORDING
+
+
+def traced(name: str = None):
+    """
+    Run the decorated function (sync or async) inside a span named after it.
+    """
+    def decorate(fn):
+        span_name = name or fn.__qualname__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.start_as_current_span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+class TracingMiddleware:
+    """
+    Gives every request an ID (the client's X-Request-ID or a new one), echoes
+    it in the response and logs, and wraps the request in a root span named
+    after its route template.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        request_id = headers.get(b"x-request-id", b"").decode()[:128] or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode())]
+                span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.set_status(StatusCode.ERROR)
+            await send(message)
+
+        method = scope["method"]
+        try:
+            with tracer.start_root_span(
+                f"{method} {scope['path']}",
+                traceparent=headers.get(b"traceparent", b"").decode(),
+                attributes={"http.method": method, "http.target": scope["path"], "request_id": request_id},
+            ) as span:
+                try:
+                    await self.app(scope, receive, send_with_request_id)
+                finally:
+                    route = getattr(scope.get("route"), "path", None)
+                    if route:
+                        span.update_name(f"{method} {route}")
+                        span.set_attribute("http.route", route)
+        finally:
+            request_id_var.reset(token)
+
+
+def configure_logging(level: str = None):
+    """
+    Add request_id to every log record and include it in the default format.
+    """
+    factory = logging.getLogRecordFactory()
+    if getattr(factory, "adds_request_id", False):
+        return
+
+    def record_factory(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        record.request_id = request_id_var.get() or "-"
+        return record
+
+    record_factory.adds_request_id = True
+    logging.setLogRecordFactory(record_factory)
+    logging.basicConfig(
+        level=level or os.getenv("LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s",
+    )